@@ -0,0 +1,49 @@
+from cpu import CPU
+from framebuffer import Framebuffer
+from jit import JitCPU
+from ramargs import parse_assignment, parse_range
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "HackAssembler"))
+from romimage import load_rom
+
+
+if __name__ == "__main__":
+    """usage:- python3 CPUEmulator.py <path-to-hack/bin file> [--cycles N] [--set ADDR=VALUE]... [--dump START:END]... [--jit]
+                                  [--framebuffer PATH] [--key CODE] [--png PATH]
+
+    Runs the program until it halts on an @END / 0;JMP loop or the cycle budget is spent,
+    then prints the registers and the requested RAM ranges.
+    With --jit basic blocks are compiled to Python functions instead of being interpreted.
+    With --framebuffer the RAM is a file backed memory map other processes can attach to,
+    --key holds a key down on KBD and --png writes a snapshot of the screen when the run ends.
+    """
+    arg_parse = argparse.ArgumentParser()
+    arg_parse.add_argument("rom_file", help="Enter path of hack or binary rom file", default="")
+    arg_parse.add_argument("--cycles", type=int, help="Maximum number of instructions to execute", default=10_000_000)
+    arg_parse.add_argument("--set", action="append", type=parse_assignment, help="Preload RAM[ADDR] with VALUE", default=[])
+    arg_parse.add_argument("--dump", action="append", type=parse_range, help="Print RAM[START..END]", default=[])
+    arg_parse.add_argument("--jit", action="store_true", help="Compile basic blocks to Python functions")
+    arg_parse.add_argument("--framebuffer", help="File to memory map the RAM to, e.g. under /dev/shm")
+    arg_parse.add_argument("--key", type=int, help="Key code held down on KBD during the run", default=0)
+    arg_parse.add_argument("--png", help="Write a png snapshot of the screen after the run")
+    args = arg_parse.parse_args()
+
+    framebuffer = Framebuffer(args.framebuffer)
+    framebuffer.press(args.key)
+    cpu = (JitCPU if args.jit else CPU)(load_rom(args.rom_file), framebuffer.ram)
+
+    for address, value in args.set:
+        cpu.ram[address] = value
+
+    cpu.run(args.cycles)
+
+    print(f"cycles: {cpu.cycles} {'halted' if cpu.halted else 'running'} A: {cpu.a} D: {cpu.d} PC: {cpu.pc}")
+    for address_range in args.dump:
+        for address in address_range:
+            print(f"RAM[{address}]: {cpu.ram[address]}")
+
+    if args.png:
+        framebuffer.snapshot(args.png)
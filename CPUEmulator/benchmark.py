@@ -0,0 +1,80 @@
+from cpu import CPU, ROM_SIZE
+from jit import JitCPU
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "HackAssembler"))
+from romimage import load_rom
+
+
+# program, RAM preloads
+PROGRAMS = {
+    "Max": (os.path.join(ROOT, "Projects", "05", "Max.hack"), {0: 3, 1: 5}),
+    "Rect": (os.path.join(ROOT, "Projects", "05", "Rect.hack"), {0: 200}),
+    "TicTacToe": (os.path.join(ROOT, "TicTacToe", "TicTacToe.hack"), {}),
+}
+
+# rom words and the cycles and RAM words each CPU has to halt with, checked before benchmarking
+CHECKS = {
+    # @10 D=A @LOOP (LOOP) D=D-1 D;JGT @100 M=1 (END) @END 0;JMP, jumps back to the instruction
+    # right before the jump ten times, that is a loop and not the halt idiom
+    "CountDown": ([10, 0xEC10, 3, 0xE390, 0xE301, 100, 0xEFC8, 7, 0xEA87], 27, {100: 1}),
+}
+
+
+def check(name: str, rom: list, cycles: int, ram: dict, cpu_class=CPU):
+    cpu = cpu_class(rom)
+    cpu.run(1000)
+    values = {address: cpu.ram[address] for address in ram}
+
+    if not cpu.halted or cpu.cycles != cycles or values != ram:
+        raise ValueError(
+            f"{name} on {cpu_class.__name__}: {'halted' if cpu.halted else 'running'} after {cpu.cycles} cycles "
+            f"with {values}, expected to halt after {cycles} cycles with {ram}"
+        )
+
+
+def bench(name: str, rom_file: str, ram: dict, cycles: int, cpu_class=CPU):
+    rom = load_rom(rom_file)
+
+    if len(rom) > ROM_SIZE:
+        print(f"{name}: {len(rom)} words do not fit the ROM, running the first {ROM_SIZE}")
+        rom = rom[:ROM_SIZE]
+
+    start = time.perf_counter()
+    cpu = cpu_class(rom)
+    decoded = time.perf_counter()
+
+    for address, value in ram.items():
+        cpu.ram[address] = value
+
+    cpu.run(cycles, stop_on_halt=False)
+    end = time.perf_counter()
+
+    print(
+        f"{name:<12}{cpu_class.__name__:<8}decode {(decoded - start) * 1e3:>8.2f} ms"
+        f"{cpu.cycles / (end - decoded) / 1e6:>10.2f} M instructions/s"
+    )
+
+
+if __name__ == "__main__":
+    """usage:- python3 benchmark.py [--cycles N]
+
+    Runs Max, Rect and TicTacToe for a fixed number of cycles on the interpreting and the basic
+    block compiling CPU and prints the emulation speed. The CPUs first have to run the CHECKS
+    programs to the expected halt.
+    """
+    arg_parse = argparse.ArgumentParser()
+    arg_parse.add_argument("--cycles", type=int, help="Number of instructions to execute per program", default=5_000_000)
+    args = arg_parse.parse_args()
+
+    for name, (rom, cycles, ram) in CHECKS.items():
+        for cpu_class in (CPU, JitCPU):
+            check(name, rom, cycles, ram, cpu_class)
+
+    for name, (rom_file, ram) in PROGRAMS.items():
+        for cpu_class in (CPU, JitCPU):
+            bench(name, rom_file, ram, args.cycles, cpu_class)
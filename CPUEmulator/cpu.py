@@ -0,0 +1,169 @@
+from array import array
+from itertools import repeat
+
+
+ROM_SIZE = 32768
+RAM_SIZE = 32768
+
+DEST_M = 1
+DEST_D = 2
+DEST_A = 4
+
+JUMP_GT = 1
+JUMP_EQ = 2
+JUMP_LT = 4
+
+# comp expressions keyed by the c1..c6 bits, y is A or M depending on the a bit
+COMP_EXPRESSIONS = {
+    0b101010: "0",
+    0b111111: "1",
+    0b111010: "-1",
+    0b001100: "d",
+    0b110000: "y",
+    0b001101: "~d",
+    0b110001: "~y",
+    0b001111: "-d",
+    0b110011: "-y",
+    0b011111: "d + 1",
+    0b110111: "y + 1",
+    0b001110: "d - 1",
+    0b110010: "y - 1",
+    0b000010: "d + y",
+    0b010011: "d - y",
+    0b000111: "y - d",
+    0b000000: "d & y",
+    0b010101: "d | y",
+}
+
+# expressions that can leave the signed 16-bit range and have to wrap around
+ARITHMETIC_COMPS = {0b001111, 0b110011, 0b011111, 0b110111, 0b001110, 0b110010, 0b000010, 0b010011, 0b000111}
+
+# comp functions are shared by every decoded program
+COMP_FUNCTIONS = {}
+
+
+def to_signed(value: int) -> int:
+    return (value + 32768 & 0xFFFF) - 32768
+
+
+def comp_source(comp_bits: int) -> str:
+    """Python expression over a, d and ram computing the 7 comp bits (a c1..c6) of a C-instruction."""
+    c_bits = comp_bits & 0b111111
+    expression = COMP_EXPRESSIONS[c_bits].replace("y", "ram[a]" if comp_bits & 0b1000000 else "a")
+
+    if c_bits in ARITHMETIC_COMPS:
+        expression = f"({expression} + 32768 & 65535) - 32768"
+
+    return expression
+
+
+def alu(comp_bits: int):
+    """Generic ALU for comp bits outside the documented instruction set."""
+    zx, nx, zy, ny, f, no = [comp_bits >> shift & 1 for shift in range(5, -1, -1)]
+    use_m = comp_bits & 0b1000000
+
+    def compute(a: int, d: int, ram: array) -> int:
+        x, y = d, ram[a] if use_m else a
+        x = ~(0 if zx else x) if nx else (0 if zx else x)
+        y = ~(0 if zy else y) if ny else (0 if zy else y)
+        out = x + y if f else x & y
+        return to_signed(~out if no else out)
+
+    return compute
+
+
+def decode_comp(comp_bits: int):
+    if comp_bits not in COMP_FUNCTIONS:
+        if comp_bits & 0b111111 in COMP_EXPRESSIONS:
+            COMP_FUNCTIONS[comp_bits] = eval(f"lambda a, d, ram: {comp_source(comp_bits)}")
+        else:
+            COMP_FUNCTIONS[comp_bits] = alu(comp_bits)
+
+    return COMP_FUNCTIONS[comp_bits]
+
+
+def decode(word: int) -> tuple:
+    """Decodes a ROM word into (comp function, dest mask, jump mask).
+
+    A-instructions have no comp function and carry their value in the dest slot.
+    """
+    if not word & 0x8000:
+        return None, word, 0
+
+    return decode_comp(word >> 6 & 0b1111111), word >> 3 & 0b111, word & 0b111
+
+
+def is_halt_loop(rom, address: int, target: int) -> bool:
+    """Whether a jump at address to target is the @END / 0;JMP idiom.
+
+    That is a jump to the instruction right before it, an A-instruction loading its own address,
+    a loop like @LOOP / (LOOP) D=D-1 / D;JGT jumps back the same distance but does not halt.
+    """
+    return target == address - 1 and target < len(rom) and rom[target] == target
+
+
+class CPU:
+    def __init__(self, rom, ram=None):
+        """ram may be any writable buffer of RAM_SIZE signed shorts, e.g. a Framebuffer's ram."""
+        if len(rom) > ROM_SIZE:
+            raise ValueError(f"Program of {len(rom)} words does not fit in the {ROM_SIZE} word ROM")
+
+        self.rom = rom
+        # unused ROM reads as 0, i.e. @0, so running off the program behaves like the hardware
+        self.program = [decode(word) for word in rom] + [decode(0)] * (ROM_SIZE - len(rom))
+        self.ram = array("h", bytes(2 * RAM_SIZE)) if ram is None else ram
+
+        if len(self.ram) != RAM_SIZE:
+            raise ValueError(f"RAM must hold {RAM_SIZE} words, supplied RAM holds {len(self.ram)}")
+        self.reset()
+
+    def reset(self):
+        self.a = 0
+        self.d = 0
+        self.pc = 0
+        self.cycles = 0
+        self.halted = False
+
+    def run(self, cycles: int, stop_on_halt: bool = True) -> int:
+        """Executes up to cycles instructions, returns the number executed.
+
+        A jump to the A-instruction right before it, i.e. the @END / 0;JMP idiom, is treated
+        as a halt and stops the run unless stop_on_halt is False.
+        """
+        program, ram, rom = self.program, self.ram, self.rom
+        a, d, pc = self.a, self.d, self.pc
+        executed = 0
+
+        for _ in repeat(None, cycles):
+            comp, dest, jump = program[pc]
+            executed += 1
+
+            if comp is None:
+                a = dest
+                pc = pc + 1 & 0x7FFF
+                continue
+
+            out = comp(a, d, ram)
+            target = a
+
+            if dest:
+                if dest & DEST_M:
+                    ram[a] = out
+                if dest & DEST_D:
+                    d = out
+                if dest & DEST_A:
+                    a = out
+
+            if jump and jump & (JUMP_LT if out < 0 else JUMP_EQ if out == 0 else JUMP_GT):
+                if stop_on_halt and is_halt_loop(rom, pc, target):
+                    self.halted = True
+                    pc = target
+                    break
+
+                pc = target & 0x7FFF
+            else:
+                pc = pc + 1 & 0x7FFF
+
+        self.a, self.d, self.pc = a, d, pc
+        self.cycles += executed
+        return executed
@@ -0,0 +1,110 @@
+from cpu import RAM_SIZE
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+
+SCREEN = 16384
+KBD = 24576
+SCREEN_WIDTH = 512
+SCREEN_HEIGHT = 256
+ROW_WORDS = SCREEN_WIDTH // 16
+ROW_BYTES = ROW_WORDS * 2
+
+# hack words store the leftmost pixel in bit 0 and draw 1 as black, 1-bit png rows store the
+# leftmost pixel in the most significant bit and draw 1 as white
+PNG_BYTE_TABLE = bytes(~int(f"{byte:08b}"[::-1], 2) & 0xFF for byte in range(256))
+
+
+def png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+
+class Framebuffer:
+    """Hack RAM backed by a memory map so the SCREEN and KBD regions can be shared.
+
+    Without a path the map is anonymous, with one it is a file (e.g. under /dev/shm) that
+    other processes open with Framebuffer(path, create=False) to read frames or press keys
+    without copying. Changed screen rows are found by comparing against a shadow copy of
+    the last frame that was collected, so the emulator itself pays nothing to track them.
+    """
+
+    def __init__(self, path: str = None, create: bool = True):
+        self.path = path
+
+        if path is None:
+            self.__map = mmap.mmap(-1, RAM_SIZE * 2)
+        else:
+            if create:
+                with open(path, "wb") as file:
+                    file.truncate(RAM_SIZE * 2)
+            elif os.path.getsize(path) != RAM_SIZE * 2:
+                raise ValueError(f"Supplied path: {path}, is not a hack framebuffer")
+
+            with open(path, "r+b") as file:
+                self.__map = mmap.mmap(file.fileno(), RAM_SIZE * 2)
+
+        self.ram = memoryview(self.__map).cast("h")
+        self.screen = self.ram[SCREEN:KBD]
+        self.__screen_bytes = memoryview(self.__map)[SCREEN * 2 : KBD * 2]
+        self.__shadow = bytearray(len(self.__screen_bytes))
+        self.__png_rows = [b"\0" + bytes(ROW_BYTES).translate(PNG_BYTE_TABLE)] * SCREEN_HEIGHT
+
+    def row(self, index: int) -> memoryview:
+        return self.__screen_bytes[index * ROW_BYTES : (index + 1) * ROW_BYTES]
+
+    def dirty_rows(self) -> list:
+        """Returns the rows that changed since the previous call and marks them clean."""
+        dirty = []
+
+        for index in range(SCREEN_HEIGHT):
+            start = index * ROW_BYTES
+            row = self.__screen_bytes[start : start + ROW_BYTES]
+
+            if row != self.__shadow[start : start + ROW_BYTES]:
+                self.__shadow[start : start + ROW_BYTES] = row
+                dirty.append(index)
+
+        return dirty
+
+    def key(self) -> int:
+        return self.ram[KBD]
+
+    def press(self, key_code: int):
+        self.ram[KBD] = key_code
+
+    def release(self):
+        self.ram[KBD] = 0
+
+    def png(self) -> bytes:
+        """Encodes the screen as a 1-bit png, re-encoding only the rows that changed."""
+        for index in self.dirty_rows():
+            row = self.row(index).tobytes()
+
+            if sys.byteorder == "big":
+                # words are stored big-endian here, the png wants their low byte first
+                row = bytes(row[i ^ 1] for i in range(ROW_BYTES))
+
+            self.__png_rows[index] = b"\0" + row.translate(PNG_BYTE_TABLE)
+
+        header = struct.pack(">IIBBBBB", SCREEN_WIDTH, SCREEN_HEIGHT, 1, 0, 0, 0, 0)
+        return b"".join(
+            [
+                b"\x89PNG\r\n\x1a\n",
+                png_chunk(b"IHDR", header),
+                png_chunk(b"IDAT", zlib.compress(b"".join(self.__png_rows))),
+                png_chunk(b"IEND", b""),
+            ]
+        )
+
+    def snapshot(self, png_file: str):
+        with open(png_file, "wb") as file:
+            file.write(self.png())
+
+    def close(self):
+        self.__screen_bytes.release()
+        self.screen.release()
+        self.ram.release()
+        self.__map.close()
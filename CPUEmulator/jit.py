@@ -0,0 +1,123 @@
+from cpu import COMP_EXPRESSIONS, CPU, DEST_A, DEST_D, DEST_M, ROM_SIZE, alu, comp_source, is_halt_loop
+
+
+MAX_BLOCK_LENGTH = 256
+
+# jump masks (j1 j2 j3) to the condition on out that takes the jump
+JUMP_CONDITIONS = {
+    0b001: "out > 0",
+    0b010: "out == 0",
+    0b011: "out >= 0",
+    0b100: "out < 0",
+    0b101: "out != 0",
+    0b110: "out <= 0",
+    0b111: "True",
+}
+
+# comp bits outside the documented instruction set are called through the generic ALU
+ALU_FUNCTIONS = {f"alu_{bits}": alu(bits) for bits in range(128) if bits & 0b111111 not in COMP_EXPRESSIONS}
+
+
+def block_source(rom, address: int) -> tuple:
+    """Generates the Python source of the basic block starting at address.
+
+    A block runs straight through A and C instructions and ends after the first jumping
+    instruction, at the end of the ROM or after MAX_BLOCK_LENGTH instructions. Addresses wrap
+    around the ROM like the program counter does, so a block always holds an instruction.
+    Returns the source, the block length and the address of its final instruction.
+    """
+    lines = [f"def block(a, d, ram):"]
+    known_a = None
+    address %= len(rom)
+    pc = address
+
+    while pc < len(rom) and pc - address < MAX_BLOCK_LENGTH:
+        word = rom[pc]
+        pc += 1
+
+        if not word & 0x8000:
+            lines.append(f"    a = {word}")
+            known_a = word
+            continue
+
+        comp, dest, jump = word >> 6 & 0b1111111, word >> 3 & 0b111, word & 0b111
+        expression = comp_source(comp) if comp & 0b111111 in COMP_EXPRESSIONS else f"alu_{comp}(a, d, ram)"
+
+        if not jump and dest == DEST_D:
+            lines.append(f"    d = {expression}")
+            continue
+
+        if jump:
+            lines.append("    target = a")
+        lines.append(f"    out = {expression}")
+
+        if dest & DEST_M:
+            lines.append("    ram[a] = out")
+        if dest & DEST_D:
+            lines.append("    d = out")
+        if dest & DEST_A:
+            lines.append("    a = out")
+
+        if jump:
+            target = known_a if known_a is not None else "target & 32767"
+            lines.append(f"    if {JUMP_CONDITIONS[jump]}:")
+            lines.append(f"        return a, d, {target}")
+            break
+
+        if dest & DEST_A:
+            known_a = None
+
+    lines.append(f"    return a, d, {pc % len(rom)}")
+    return "\n".join(lines), pc - address, pc - 1
+
+
+def compile_block(rom, address: int) -> tuple:
+    """Compiles the basic block at address into (function, length, address of its final instruction)."""
+    source, length, last_address = block_source(rom, address)
+    namespace = dict(ALU_FUNCTIONS)
+    exec(compile(source, f"<block {address}>", "exec"), namespace)
+    return namespace["block"], length, last_address
+
+
+class JitCPU(CPU):
+    """CPU that executes whole basic blocks as single generated Python functions.
+
+    Blocks are compiled the first time execution reaches their entry address and cached by it,
+    cycles are still counted per instruction.
+    """
+
+    def __init__(self, rom, ram=None):
+        super().__init__(rom, ram)
+        # padded like the interpreter, the unused ROM is a run of @0 instructions
+        self.rom = list(rom) + [0] * (ROM_SIZE - len(rom))
+        self.blocks = {}
+
+    def run(self, cycles: int, stop_on_halt: bool = True) -> int:
+        blocks, ram = self.blocks, self.ram
+        a, d, pc = self.a, self.d, self.pc
+        executed = 0
+
+        while executed < cycles:
+            block = blocks.get(pc)
+
+            if block is None:
+                block = blocks[pc] = compile_block(self.rom, pc)
+
+            function, length, last_address = block
+
+            if executed + length > cycles:
+                # not enough budget left for the whole block, finish instruction by instruction
+                self.a, self.d, self.pc = a, d, pc
+                self.cycles += executed
+                return executed + super().run(cycles - executed, stop_on_halt)
+
+            a, d, pc = function(a, d, ram)
+            executed += length
+
+            if stop_on_halt and is_halt_loop(self.rom, last_address, pc):
+                self.halted = True
+                break
+
+        self.a, self.d, self.pc = a, d, pc
+        self.cycles += executed
+        return executed
@@ -0,0 +1,10 @@
+def parse_assignment(assignment: str) -> tuple:
+    """Parses an ADDR=VALUE RAM preload given on the command line."""
+    address, _, value = assignment.partition("=")
+    return int(address), int(value)
+
+
+def parse_range(address_range: str) -> range:
+    """Parses a START:END, or a single START, RAM range to dump."""
+    start, _, end = address_range.partition(":")
+    return range(int(start), int(end or start) + 1)
@@ -50,6 +50,19 @@ class Code:
             "JLE": "110",
             "JMP": "111"
         }
+        
+        self.__lookup_instruction = self.__build_instruction_table()
+    
+    def __build_instruction_table(self) -> dict:
+        # every legal dest x comp x jump combination mapped to its 16-bit word
+        table = {}
+        
+        for dest, dest_bits in {"": "000", **self.__lookup_dest}.items():
+            for comp, comp_bits in self.__lookup_comp.items():
+                for jump, jump_bits in {"": "000", **self.__lookup_jump}.items():
+                    table[(dest, comp, jump)] = int(f"111{comp_bits}{dest_bits}{jump_bits}", 2)
+        
+        return table
     
     def dest(self, mnemonic: str) -> str:
         return self.__lookup_dest.get(mnemonic, "000")
@@ -59,3 +72,11 @@ class Code:
     
     def jump(self, mnemonic: str) -> str:
         return self.__lookup_jump.get(mnemonic, "000")
+    
+    def instruction(self, dest: str, comp: str, jump: str) -> int:
+        word = self.__lookup_instruction.get((dest, comp, jump))
+        
+        if word is None:
+            word = int(f"111{self.comp(comp)}{self.dest(dest)}{self.jump(jump)}", 2)
+        
+        return word
@@ -1,54 +1,155 @@
 from asmparser import Parser
+from cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE, OutputCache
 from Code import Code
 from constants import InstructionType
+from romimage import BINARY_EXTENSION, write_binary
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 import argparse
+import glob
 import os
+import time
+
+
+CHUNK_SIZE = 1 << 16
+
+
+def assemble(parser: Parser, opcode_gen: Code):
+    """Yields the 16-bit machine word of every instruction in the parsed program."""
+    for instruction in parser.instructions():
+        if instruction.type == InstructionType.A_INSTRUCTION:
+            symbol = instruction.symbol
+
+            if not symbol.isdigit():
+                if parser.symbol_table.contains(symbol):
+                    symbol = parser.symbol_table.getAddress(symbol)
+                else:
+                    address = parser.available_ram
+                    parser.available_ram = parser.available_ram + 1
+                    parser.symbol_table.addEntry(symbol, address)
+                    symbol = address
+
+            yield int(symbol)
+
+        elif instruction.type == InstructionType.C_INSTRUCTION:
+            yield opcode_gen.instruction(instruction.dest, instruction.comp, instruction.jump)
+
+
+def chunks(words, chunk_size: int = CHUNK_SIZE):
+    words = iter(words)
+    chunk = list(islice(words, chunk_size))
+
+    while chunk:
+        yield chunk
+        chunk = list(islice(words, chunk_size))
+
+
+def write_hack(words, output_file: str):
+    with open(output_file, "w") as file:
+        for chunk in chunks(words):
+            file.write("".join([f"{word:016b}\n" for word in chunk]))
+
+
+def output_file(asm_file: str, binary: bool = False) -> str:
+    return f"{asm_file[:-len('.asm')]}{BINARY_EXTENSION if binary else '.hack'}"
+
+
+def assemble_file(
+    asm_file: str, binary: bool = False, streaming: bool = False, cache_dir: str = None, cache_size: int = DEFAULT_CACHE_SIZE
+) -> tuple:
+    """Assembles a single .asm file next to its source.
+
+    When a cache_dir is supplied unchanged sources are restored from the cache instead.
+    Returns the time taken in seconds and whether the output came from the cache.
+    """
+    start = time.perf_counter()
+    output = output_file(asm_file, binary)
+    cache = key = None
+
+    if cache_dir:
+        cache = OutputCache(cache_dir, cache_size)
+        key = cache.key(asm_file, "binary" if binary else "text")
+
+        if cache.restore(key, output):
+            return time.perf_counter() - start, True
+
+    words = assemble(Parser(asm_file, streaming=streaming), Code())
+
+    if binary:
+        write_binary(words, output)
+    else:
+        write_hack(words, output)
+
+    if cache:
+        cache.store(key, output)
+
+    return time.perf_counter() - start, False
+
+
+def collect_asm_files(paths: list) -> list:
+    """Expands directories and glob patterns into a sorted list of unique .asm files."""
+    asm_files = set()
+
+    for path in paths:
+        if os.path.isdir(path):
+            matches = [os.path.join(path, file) for file in os.listdir(path)]
+        else:
+            matches = glob.glob(path) or [path]
+
+        for match in matches:
+            if match.endswith(".asm") and os.path.isfile(match):
+                asm_files.add(match)
+            elif match == path:
+                raise ValueError(f"Enter a valid asm file path, supplied path: {path} does not exist")
+
+    return sorted(asm_files)
+
+
+def assemble_files(asm_files: list, jobs: int = None, **options) -> dict:
+    """Assembles every file across a process pool, returning the assemble_file result per file."""
+    if len(asm_files) == 1 or jobs == 1:
+        return {asm_file: assemble_file(asm_file, **options) for asm_file in asm_files}
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {asm_file: executor.submit(assemble_file, asm_file, **options) for asm_file in asm_files}
+        return {asm_file: future.result() for asm_file, future in futures.items()}
 
 
 if __name__ == "__main__":
-    """usage:- python3 HackAssembler.py <path-to-asm file>
+    """usage:- python3 HackAssembler.py <path-to-asm file/directory/glob>... [--binary] [--stream] [--jobs N] [--cache]
 
-    Generates .hack file with same file name in the location of the .asm file.
+    Generates .hack file with same file name in the location of each .asm file.
+    Multiple files are assembled in parallel and a summary of per file timings is printed.
+    With --binary a packed little-endian uint16 image is written to a .bin file instead.
+    With --stream the asm file is re-read for each pass instead of being held in memory.
+    With --cache outputs of sources that did not change since they were last assembled are reused.
     """
     arg_parse = argparse.ArgumentParser()
-    arg_parse.add_argument("asm_file", help="Enter path of asm code file", default="")
+    arg_parse.add_argument("asm_files", nargs="+", help="Enter paths of asm code files, directories or globs")
+    arg_parse.add_argument("--binary", action="store_true", help="Write a packed binary rom image")
+    arg_parse.add_argument("--stream", action="store_true", help="Assemble in constant memory")
+    arg_parse.add_argument("--jobs", type=int, help="Number of worker processes, defaults to the cpu count")
+    arg_parse.add_argument("--cache", action="store_true", help="Reuse outputs of unchanged sources")
+    arg_parse.add_argument("--cache-dir", help="Directory of the output cache", default=DEFAULT_CACHE_DIR)
+    arg_parse.add_argument("--cache-size", type=int, help="Size limit of the output cache in MB", default=DEFAULT_CACHE_SIZE >> 20)
     args = arg_parse.parse_args()
-    asm_file = args.asm_file
-    
-    
-    if not os.path.exists(asm_file) or not asm_file.endswith(".asm"):
-        raise ValueError(f"Enter a valid asm file path, supplied path: {asm_file} does not exist")
-    
-    output_path, file_name = os.path.split(asm_file)
-    parser = Parser(asm_file)
-    opcode_gen = Code()
-    
-    with open(os.path.join(output_path, file_name.replace(".asm", ".hack")), "w") as file:
-        while parser.hasMoreLines():
-            parser.advance()
-            instruction_type = parser.instructionType()
-            
-            if instruction_type == InstructionType.A_INSTRUCTION:
-                symbol = parser.symbol()
-        
-                if not symbol.isdigit():
-                    if parser.symbol_table.contains(symbol):
-                        symbol = parser.symbol_table.getAddress(symbol)
-                    else:
-                        address = parser.available_ram
-                        parser.available_ram = parser.available_ram + 1
-                        parser.symbol_table.addEntry(symbol, address)
-                        symbol = address
-            
-                bin_val = bin(int(symbol)).replace("0b", "")
-                bin_val = f"{(16 - len(bin_val)) * '0'}{bin_val}\n" 
-                file.write(bin_val)
-                        
-            elif instruction_type == InstructionType.C_INSTRUCTION:
-                dest = opcode_gen.dest(parser.dest())
-                comp = opcode_gen.comp(parser.comp())
-                jump = opcode_gen.jump(parser.jump())
-                file.write(f"111{comp}{dest}{jump}\n")
-        
-            
-    
\ No newline at end of file
+
+    asm_files = collect_asm_files(args.asm_files)
+
+    if not asm_files:
+        raise ValueError(f"No asm files found in supplied paths: {args.asm_files}")
+
+    start = time.perf_counter()
+    timings = assemble_files(
+        asm_files,
+        args.jobs,
+        binary=args.binary,
+        streaming=args.stream,
+        cache_dir=args.cache_dir if args.cache else None,
+        cache_size=args.cache_size << 20,
+    )
+
+    if len(timings) > 1:
+        for asm_file, (seconds, cached) in timings.items():
+            print(f"{seconds * 1e3:>10.1f} ms  {asm_file}{'  (cached)' if cached else ''}")
+        print(f"{(time.perf_counter() - start) * 1e3:>10.1f} ms  total for {len(timings)} files")
@@ -1,114 +1,129 @@
 from constants import InstructionType
 from SymbolTable import SymbolTable
+from typing import NamedTuple
 import os
 import re
 
 
-C_INS_PATTERN = "(?:([ADM]{0,3})=)?([01ADM\-+!&|]{1,3})(?:;(JGT|JEQ|JGE|JLT|JNE|JLE|JMP))?"
+COMMENT_OR_SPACE_PATTERN = re.compile(r"//[^\n]*|[ \t\r\f\v]+")
+WHITESPACE_TABLE = str.maketrans("", "", " \t\r\n\f\v")
+
+
+def normalize(line: str) -> str:
+    """Strips the comment and every whitespace character from a single line."""
+    return line.partition("//")[0].translate(WHITESPACE_TABLE)
+
+
+def normalize_source(source: str) -> list:
+    """Strips comments and whitespace from a whole program, returning its non empty lines."""
+    return COMMENT_OR_SPACE_PATTERN.sub("", source).split()
+
+
+class Instruction(NamedTuple):
+    type: InstructionType
+    dest: str = ""
+    comp: str = ""
+    jump: str = ""
+    symbol: str = None
+
+
+def decode(line: str) -> Instruction:
+    """Decodes a stripped, non empty assembly line into an Instruction in a single pass."""
+    if line.startswith("("):
+        return Instruction(InstructionType.L_INSTRUCTION, "", "", "", line[1:-1])
+    elif line.startswith("@"):
+        return Instruction(InstructionType.A_INSTRUCTION, "", "", "", line[1:])
+
+    dest, _, comp = line.rpartition("=")
+    comp, _, jump = comp.partition(";")
+    return Instruction(InstructionType.C_INSTRUCTION, dest, comp, jump)
 
 
 class Parser:
-    def __init__(self, input_file: str):
+    def __init__(self, input_file: str = None, streaming: bool = False, source: str = None):
+        """With streaming set the file is never held in memory, both passes re-read it
+        line by line and instructions() has to be used instead of advance().
+        Assembly already in memory, e.g. from the VMTranslator, is supplied as source instead of a file."""
         self.__file_contents = []
+        self.__input_file = input_file
+        self.streaming = streaming
         self.current_line_no = 0
         self.parsed_line = ""
+        self.instruction = None
         self.completed = False
         self.symbol_table = SymbolTable()
         self.available_ram = 16
         
-        if not os.path.isfile(input_file):
+        if source is not None:
+            if streaming:
+                raise ValueError("Assembly supplied as source cannot be streamed")
+            
+            self.__file_contents = normalize_source(source)
+            self.completed = not self.__file_contents
+        elif not (input_file and os.path.isfile(input_file)):
             raise ValueError(f"Supplied path: {input_file}, is not a file")
-        
-        with open(input_file) as file:
-            self.__file_contents = file.readlines()
+        elif not streaming:
+            with open(input_file) as file:
+                self.__file_contents = normalize_source(file.read())
+            
+            self.completed = not self.__file_contents
         
         self.__first_pass()
     
+    def __lines(self):
+        # normalized, non empty lines shared by both passes
+        if self.streaming:
+            with open(self.__input_file) as file:
+                for line in file:
+                    line = normalize(line)
+                    
+                    if line:
+                        yield line
+        else:
+            yield from self.__file_contents
+    
     def __first_pass(self):
         instruction_count = 0
         labels_found = 0
         
-        for line in self.__file_contents:
-            current_line = self.__strip_comments(line).strip()
+        for line in self.__lines():
+            instruction_count += 1
             
-            if current_line:
-                self.parsed_line = current_line
-                instruction_count += 1
-                
-                if self.instructionType() == InstructionType.L_INSTRUCTION:
-                    self.symbol_table.addEntry(self.symbol(), instruction_count - 1 - labels_found)
-                    labels_found += 1
-
+            if line.startswith("("):
+                self.symbol_table.addEntry(line[1:-1], instruction_count - 1 - labels_found)
+                labels_found += 1
+    
+    def instructions(self):
+        """Yields the decoded instruction of every non empty line, in program order."""
+        for line in self.__lines():
+            yield decode(line)
     
     def hasMoreLines(self) -> bool:
+        if self.streaming:
+            raise ValueError("Streaming parser has no random access, iterate over instructions() instead")
+        
         return not self.completed 
     
-    def __strip_comments(self, string) -> str:
-        if len(string) >= 1:
-            chars = []
-            
-            if string[0] != "/":
-                chars.append(string[0])
-                
-            for i in range(1, len(string)):
-                if not (string[i] == "/" and string[i - 1] == "/"):
-                    if string[i] != " ":
-                        chars.append(string[i])
-                else:
-                    break
-            
-            string = "".join(chars)
-
-        return string
-    
     def advance(self):
-        while self.hasMoreLines():
-            try:
-                current_line = self.__strip_comments(self.__file_contents[self.current_line_no]).strip()
-                self.current_line_no += 1
-                
-                if self.current_line_no == len(self.__file_contents):
-                    self.completed = True
-                            
-                if current_line:
-                    self.parsed_line = current_line
-                    break
-            except:
-                return
-            
+        if self.hasMoreLines():
+            self.parsed_line = self.__file_contents[self.current_line_no]
+            self.instruction = decode(self.parsed_line)
+            self.current_line_no += 1
             
+            if self.current_line_no == len(self.__file_contents):
+                self.completed = True
     
     def instructionType(self) -> InstructionType:
-        current_line = self.parsed_line
-        
-        if current_line.startswith("("):
-            return InstructionType.L_INSTRUCTION
-        elif current_line.startswith("@"):
-            return InstructionType.A_INSTRUCTION
-        
-        return InstructionType.C_INSTRUCTION
+        return self.instruction.type
     
     def symbol(self) -> str:
-        if self.instructionType() == InstructionType.L_INSTRUCTION:
-            return self.parsed_line[1:-1]
-        elif self.instructionType() == InstructionType.A_INSTRUCTION:
-            return self.parsed_line[1:]
-        
-        return None
-    
-    def __c_matches(self, index) -> str:
-        matches = re.search(C_INS_PATTERN, self.parsed_line)
-        
-        if matches.groups()[index]:
-            return matches.groups()[index]
-        
-        return ""
+        return self.instruction.symbol
     
     def dest(self) -> str:
-        return self.__c_matches(0)
+        return self.instruction.dest
     
     def comp(self) -> str:
-        return self.__c_matches(1)
+        return self.instruction.comp
     
     def jump(self) -> str:
-        return self.__c_matches(2)
\ No newline at end of file
+        return self.instruction.jump
@@ -0,0 +1,84 @@
+from asmparser import decode, normalize, normalize_source
+import argparse
+import os
+import re
+import timeit
+
+
+C_INS_PATTERN = "(?:([ADM]{0,3})=)?([01ADM\-+!&|]{1,3})(?:;(JGT|JEQ|JGE|JLT|JNE|JLE|JMP))?"
+DEFAULT_ASM_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "TicTacToe", "TicTacToe.asm"
+)
+
+
+def regex_decode(line: str):
+    """Reference decoder mirroring the previous Parser, one regex search per field."""
+    fields = []
+
+    if line.startswith("("):
+        return line[1:-1]
+    elif line.startswith("@"):
+        return line[1:]
+
+    for index in range(3):
+        matches = re.search(C_INS_PATTERN, line)
+        fields.append(matches.groups()[index] or "")
+
+    return fields
+
+
+def char_loop_strip(string: str) -> str:
+    """Reference comment stripper mirroring the previous Parser, one character at a time."""
+    if len(string) >= 1:
+        chars = []
+
+        if string[0] != "/":
+            chars.append(string[0])
+
+        for i in range(1, len(string)):
+            if not (string[i] == "/" and string[i - 1] == "/"):
+                if string[i] != " ":
+                    chars.append(string[i])
+            else:
+                break
+
+        string = "".join(chars)
+
+    return string.strip()
+
+
+def bench(label: str, fn, lines: list, repeat: int):
+    best = min(timeit.repeat(lambda: [fn(line) for line in lines], number=1, repeat=repeat))
+    print(f"{label:<24}{best * 1e3:>10.2f} ms{best / len(lines) * 1e9:>10.0f} ns/line")
+
+
+def bench_normalizer(source: str, repeat: int):
+    raw_lines = source.splitlines(True)
+    print(f"normalizing {len(raw_lines)} lines")
+    bench("character loop", char_loop_strip, raw_lines, repeat)
+    bench("partition + translate", normalize, raw_lines, repeat)
+    best = min(timeit.repeat(lambda: normalize_source(source), number=1, repeat=repeat))
+    print(f"{'whole buffer regex':<24}{best * 1e3:>10.2f} ms{best / len(raw_lines) * 1e9:>10.0f} ns/line")
+
+
+def bench_decoder(lines: list, repeat: int):
+    print(f"decoding {len(lines)} instructions")
+    bench("regex (3 searches)", regex_decode, lines, repeat)
+    bench("single pass decode", decode, lines, repeat)
+
+
+if __name__ == "__main__":
+    """usage:- python3 benchmark.py [path-to-asm file] [--repeat N]
+
+    Prints the per line cost of the assembler hot paths on the supplied program.
+    """
+    arg_parse = argparse.ArgumentParser()
+    arg_parse.add_argument("asm_file", nargs="?", help="Enter path of asm code file", default=DEFAULT_ASM_FILE)
+    arg_parse.add_argument("--repeat", type=int, help="Number of timed runs, best is reported", default=5)
+    args = arg_parse.parse_args()
+
+    with open(args.asm_file) as file:
+        source = file.read()
+
+    bench_normalizer(source, args.repeat)
+    bench_decoder(normalize_source(source), args.repeat)
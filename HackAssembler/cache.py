@@ -0,0 +1,31 @@
+from constants import ASSEMBLER_VERSION
+from filecache import DEFAULT_CACHE_SIZE, FileCache, hash_file
+import filecmp
+import hashlib
+import os
+import shutil
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "HackAssembler")
+
+
+class OutputCache(FileCache):
+    """Content addressed store of assembled outputs."""
+
+    def key(self, source_file: str, *options: str) -> str:
+        digest = hashlib.sha256(":".join([ASSEMBLER_VERSION, *options]).encode())
+        return hash_file(source_file, digest).hexdigest()
+
+    def restore(self, key: str, output_file: str) -> bool:
+        """Puts the cached output for key in place, returns False on a cache miss."""
+        if not self.touch(key):
+            return False
+
+        entry = self.entry(key)
+        if not (os.path.isfile(output_file) and filecmp.cmp(entry, output_file, shallow=False)):
+            shutil.copyfile(entry, output_file)
+
+        return True
+
+    def store(self, key: str, output_file: str):
+        self.write(key, lambda entry: shutil.copyfile(output_file, entry))
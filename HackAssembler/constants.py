@@ -5,3 +5,7 @@ class InstructionType(Enum):
     A_INSTRUCTION = "a_instruction"
     C_INSTRUCTION = "c_instruction"
     L_INSTRUCTION = "l_instruction"
+
+
+# bump whenever a change alters the generated machine code, invalidates cached outputs
+ASSEMBLER_VERSION = "1.0"
@@ -0,0 +1,101 @@
+from array import array
+from itertools import islice
+import mmap
+import os
+import sys
+
+
+TEXT_FORMAT = "text"
+BINARY_FORMAT = "binary"
+BINARY_EXTENSION = ".bin"
+
+
+def write_binary(words, output_file: str, chunk_size: int = 1 << 16):
+    """Writes the words as a packed little-endian uint16 ROM image."""
+    words = iter(words)
+
+    with open(output_file, "wb") as file:
+        image = array("H", islice(words, chunk_size))
+
+        while image:
+            if sys.byteorder == "big":
+                image.byteswap()
+
+            image.tofile(file)
+            image = array("H", islice(words, chunk_size))
+
+
+def rom_format(rom_file: str) -> str:
+    return TEXT_FORMAT if rom_file.endswith(".hack") else BINARY_FORMAT
+
+
+def load_rom(rom_file: str, kind: str = None, use_numpy: bool = False):
+    """Memory maps a .hack (text) or packed binary ROM image and reads its words.
+
+    Binary images are copied out of the mapping in one block, text images have to be
+    decoded. Both are returned as an array('H') or a numpy array when use_numpy is set.
+    """
+    if not os.path.isfile(rom_file):
+        raise ValueError(f"Supplied path: {rom_file}, is not a file")
+
+    kind = kind or rom_format(rom_file)
+
+    if kind not in (TEXT_FORMAT, BINARY_FORMAT):
+        raise ValueError(f"Unknown rom format: {kind}")
+
+    if os.path.getsize(rom_file) == 0:
+        return _empty(use_numpy)
+
+    # the words are copied out before the mapping is closed, nothing returned refers to it
+    with open(rom_file, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        if kind == BINARY_FORMAT:
+            return _load_binary(buffer, use_numpy)
+
+        return _load_text(buffer, use_numpy)
+
+
+def _empty(use_numpy: bool):
+    if use_numpy:
+        import numpy
+
+        return numpy.zeros(0, dtype="<u2")
+
+    return array("H")
+
+
+def _load_binary(buffer: mmap.mmap, use_numpy: bool):
+    if len(buffer) % 2:
+        raise ValueError("Binary rom image must contain a whole number of 16-bit words")
+
+    if use_numpy:
+        import numpy
+
+        return numpy.frombuffer(buffer, dtype="<u2").copy()
+
+    words = array("H")
+    words.frombytes(buffer)
+
+    if sys.byteorder == "big":
+        # the image is little-endian
+        words.byteswap()
+
+    return words
+
+
+def _load_text(buffer: mmap.mmap, use_numpy: bool):
+    if use_numpy and len(buffer) % 17 == 0 and buffer[16:17] == b"\n":
+        import numpy
+
+        # fixed width rows of 16 ascii bits and a newline, weighted sum of the bits
+        rows = numpy.frombuffer(buffer, dtype=numpy.uint8).reshape(-1, 17)[:, :16]
+        weights = 1 << numpy.arange(15, -1, -1, dtype=numpy.uint32)
+        return ((rows - ord("0")) @ weights).astype("<u2")
+
+    words = array("H", [int(line, 2) for line in buffer[:].split() if line])
+
+    if use_numpy:
+        import numpy
+
+        return numpy.array(words, dtype="<u2")
+
+    return words
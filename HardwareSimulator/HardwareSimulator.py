@@ -0,0 +1,142 @@
+from cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE, CompiledChipCache
+from testscript import ComparisonFailure, SkippedScript, TestScript
+from concurrent.futures import ProcessPoolExecutor
+from itertools import zip_longest
+import argparse
+import os
+import time
+
+
+DEFAULT_LIBRARY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "HackHardware")
+
+
+def find_scripts(paths: list) -> list:
+    tst_files = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, files in os.walk(path):
+                tst_files.extend(os.path.join(directory, file) for file in files if file.endswith(".tst"))
+        else:
+            tst_files.append(path)
+
+    return sorted(tst_files)
+
+
+def compare_backends(tst_file: str, library_dirs: list, builtin_stubs: bool = False, cache=None) -> tuple:
+    """Runs the script on the compiled and on the interpreted chip, leaving out its compare-to file.
+
+    Returns the status and message, PASS when both output the same lines and FAIL with the first
+    line they differ on otherwise, so the compiler is checked against the interpreter even for
+    chips that do not pass their own test yet.
+    """
+    compiled = TestScript(tst_file, library_dirs, builtin_stubs, False, cache, check_outputs=False).run()
+    interpreted = TestScript(tst_file, library_dirs, builtin_stubs, True, check_outputs=False).run()
+
+    for line_number, (compiled_line, interpreted_line) in enumerate(zip_longest(compiled, interpreted), 1):
+        if compiled_line != interpreted_line:
+            return "FAIL", (
+                f"Backends differ at line {line_number}: compiled {compiled_line!r} but interpreted {interpreted_line!r}"
+            )
+
+    return "PASS", ""
+
+
+def run_test(
+    tst_file: str, library_dirs: list, builtin_stubs: bool = False, interpret: bool = False, cache_dir: str = None,
+    cache_size: int = DEFAULT_CACHE_SIZE, compare: bool = False,
+) -> tuple:
+    """Runs one script, returning its file, status, message and wall time in seconds.
+
+    When a cache_dir is supplied compiled chips are reused while their hdl files are unchanged.
+    With compare set the outputs of the two backends are compared with each other, see compare_backends.
+    """
+    start = time.perf_counter()
+    cache = CompiledChipCache(cache_dir, cache_size) if cache_dir else None
+
+    try:
+        if compare:
+            status, message = compare_backends(tst_file, library_dirs, builtin_stubs, cache)
+        else:
+            TestScript(tst_file, library_dirs, builtin_stubs, interpret, cache).run()
+            status, message = "PASS", ""
+    except SkippedScript as error:
+        status, message = "SKIP", str(error)
+    except ComparisonFailure as error:
+        status, message = "FAIL", str(error)
+    except (ValueError, OSError) as error:
+        status, message = "ERROR", str(error)
+
+    return tst_file, status, message, time.perf_counter() - start
+
+
+def run_tests(tst_files: list, library_dirs: list, jobs: int = None, **options):
+    """Yields the run_test results in file order, running the scripts across a process pool."""
+    if len(tst_files) == 1 or jobs == 1:
+        for tst_file in tst_files:
+            yield run_test(tst_file, library_dirs, **options)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(run_test, tst_file, library_dirs, **options) for tst_file in tst_files]
+
+        for future in futures:
+            yield future.result()
+
+
+if __name__ == "__main__":
+    """usage:- python3 HardwareSimulator.py <path-to-tst file/directory>... [--jobs N] [--builtin] [--lib DIR]... [--interpret]
+                                       [--cache] [--compare]
+
+    Runs every .tst script found against its chip, comparing the output with the compare-to file,
+    and prints the result and wall time of each script followed by a summary.
+    Scripts are run in parallel across a process pool, scripts that do not load a .hdl chip are skipped.
+    Chips are looked up in the directory of the script, then in the --lib directories (HackHardware
+    by default) and then among the builtin chips. With --builtin chips whose PARTS are still
+    empty are simulated by their builtin implementation.
+    Chips are flattened into a netlist of builtin chips and compiled to straight-line python, with
+    --cache the compiled chips are kept until their hdl changes. --interpret evaluates the chip
+    hierarchy part by part instead, as a reference for the compiler. --compare runs every script on
+    both and checks they output the same lines, whether or not the chips pass their own tests.
+    The Projects hdl files are skeletons, their scripts only pass with --builtin.
+    """
+    arg_parse = argparse.ArgumentParser()
+    arg_parse.add_argument("paths", nargs="+", help="Enter paths of tst files or directories to search for them")
+    arg_parse.add_argument("--jobs", type=int, help="Number of worker processes, defaults to the cpu count")
+    arg_parse.add_argument("--builtin", action="store_true", help="Use builtin chips for chips without parts")
+    arg_parse.add_argument("--lib", action="append", help="Directory of hdl chips shared by the tests")
+    arg_parse.add_argument("--interpret", action="store_true", help="Interpret the chip hierarchy instead of compiling it")
+    arg_parse.add_argument("--compare", action="store_true", help="Check the compiled chips against the interpreter")
+    arg_parse.add_argument("--cache", action="store_true", help="Reuse compiled chips whose hdl files are unchanged")
+    arg_parse.add_argument("--cache-dir", help="Directory of the compiled chip cache", default=DEFAULT_CACHE_DIR)
+    arg_parse.add_argument("--cache-size", type=int, help="Size limit of the compiled chip cache in MB", default=DEFAULT_CACHE_SIZE >> 20)
+    args = arg_parse.parse_args()
+
+    tst_files = find_scripts(args.paths)
+    if not tst_files:
+        raise ValueError("Enter a valid tst file or a directory containing them")
+
+    library_dirs = args.lib or [DEFAULT_LIBRARY]
+    counts = {"PASS": 0, "FAIL": 0, "ERROR": 0, "SKIP": 0}
+    start = time.perf_counter()
+
+    results = run_tests(
+        tst_files,
+        library_dirs,
+        args.jobs,
+        builtin_stubs=args.builtin,
+        interpret=args.interpret,
+        cache_dir=args.cache_dir if args.cache else None,
+        cache_size=args.cache_size << 20,
+        compare=args.compare,
+    )
+
+    for tst_file, status, message, elapsed in results:
+        counts[status] += 1
+        print(f"{status:<5} {elapsed * 1000:8.1f} ms  {os.path.relpath(tst_file)}{'  ' + message if message else ''}")
+
+    summary = ", ".join(f"{count} {status.lower()}" for status, count in counts.items() if count)
+    print(f"{summary} in {time.perf_counter() - start:.2f} s")
+
+    if counts["FAIL"] or counts["ERROR"]:
+        raise SystemExit(1)
@@ -0,0 +1,384 @@
+WORD_MASK = 0xFFFF
+SCREEN_BASE = 16384
+KEYBOARD_ADDRESS = 24576
+
+
+def alu(x: int, y: int, zx: int, nx: int, zy: int, ny: int, f: int, no: int) -> int:
+    if zx:
+        x = 0
+    if nx:
+        x ^= WORD_MASK
+    if zy:
+        y = 0
+    if ny:
+        y ^= WORD_MASK
+
+    out = (x + y) & WORD_MASK if f else x & y
+    return out ^ WORD_MASK if no else out
+
+
+# combinational chips as input widths, output widths and one python expression per output
+# over the {pin} values, an expression may use the outputs listed before it
+COMBINATIONAL_CHIPS = {
+    "Nand": ({"a": 1, "b": 1}, {"out": 1}, ["({a} & {b}) ^ 1"]),
+    "Not": ({"in": 1}, {"out": 1}, ["{in} ^ 1"]),
+    "And": ({"a": 1, "b": 1}, {"out": 1}, ["{a} & {b}"]),
+    "Or": ({"a": 1, "b": 1}, {"out": 1}, ["{a} | {b}"]),
+    "Xor": ({"a": 1, "b": 1}, {"out": 1}, ["{a} ^ {b}"]),
+    "Mux": ({"a": 1, "b": 1, "sel": 1}, {"out": 1}, ["{b} if {sel} else {a}"]),
+    "DMux": ({"in": 1, "sel": 1}, {"a": 1, "b": 1}, ["0 if {sel} else {in}", "{in} if {sel} else 0"]),
+    "Not16": ({"in": 16}, {"out": 16}, ["{in} ^ 65535"]),
+    "And16": ({"a": 16, "b": 16}, {"out": 16}, ["{a} & {b}"]),
+    "Or16": ({"a": 16, "b": 16}, {"out": 16}, ["{a} | {b}"]),
+    "Mux16": ({"a": 16, "b": 16, "sel": 1}, {"out": 16}, ["{b} if {sel} else {a}"]),
+    "Or8Way": ({"in": 8}, {"out": 1}, ["1 if {in} else 0"]),
+    "Mux4Way16": ({"a": 16, "b": 16, "c": 16, "d": 16, "sel": 2}, {"out": 16}, ["({a}, {b}, {c}, {d})[{sel}]"]),
+    "Mux8Way16": (
+        {"a": 16, "b": 16, "c": 16, "d": 16, "e": 16, "f": 16, "g": 16, "h": 16, "sel": 3},
+        {"out": 16},
+        ["({a}, {b}, {c}, {d}, {e}, {f}, {g}, {h})[{sel}]"],
+    ),
+    "DMux4Way": ({"in": 1, "sel": 2}, dict.fromkeys("abcd", 1), [f"{{in}} if {{sel}} == {index} else 0" for index in range(4)]),
+    "DMux8Way": ({"in": 1, "sel": 3}, dict.fromkeys("abcdefgh", 1), [f"{{in}} if {{sel}} == {index} else 0" for index in range(8)]),
+    "HalfAdder": ({"a": 1, "b": 1}, {"sum": 1, "carry": 1}, ["{a} ^ {b}", "{a} & {b}"]),
+    "FullAdder": ({"a": 1, "b": 1, "c": 1}, {"sum": 1, "carry": 1}, ["{a} ^ {b} ^ {c}", "({a} + {b} + {c}) >> 1"]),
+    "Add16": ({"a": 16, "b": 16}, {"out": 16}, ["({a} + {b}) & 65535"]),
+    "Inc16": ({"in": 16}, {"out": 16}, ["({in} + 1) & 65535"]),
+    "ALU": (
+        {"x": 16, "y": 16, "zx": 1, "nx": 1, "zy": 1, "ny": 1, "f": 1, "no": 1},
+        {"out": 16, "zr": 1, "ng": 1},
+        ["alu({x}, {y}, {zx}, {nx}, {zy}, {ny}, {f}, {no})", "1 if {out} == 0 else 0", "{out} >> 15"],
+    ),
+}
+
+
+class BuiltinChip:
+    """A chip implemented in python rather than hdl.
+
+    evaluate takes the values of the inputs not in clocked, in declaration order, and returns the
+    output values in declaration order. latch samples every input when the clock rises and
+    commit makes the sampled state visible when it falls. Outputs in registered only depend on
+    the state and can be read through registered_outputs before any input is known. Chips with
+    state support indexing for the name[index] references of test scripts.
+    """
+
+    name = None
+    inputs = {}
+    outputs = {}
+    clocked = ()
+    registered = ()
+
+    def parts(self) -> list:
+        """Builtin chips this one is made of, for test scripts to reach their state."""
+        return []
+
+    def evaluate(self, *values) -> tuple:
+        raise NotImplementedError
+
+    def registered_outputs(self) -> tuple:
+        raise NotImplementedError
+
+    def latch(self, *values):
+        pass
+
+    def commit(self):
+        pass
+
+    def __getitem__(self, index: int) -> int:
+        raise ValueError(f"{self.name} has no internal state")
+
+    def __setitem__(self, index: int, value: int):
+        raise ValueError(f"{self.name} has no internal state")
+
+
+def combinational_chip(name: str, inputs: dict, outputs: dict, expressions: list) -> type:
+    variables = {pin: f"v_{pin}" for pin in (*inputs, *outputs)}
+    source = "\n".join(
+        [
+            f"def evaluate(self, {', '.join(variables[pin] for pin in inputs)}):",
+            *[f"    {variables[pin]} = {expression.format(**variables)}" for pin, expression in zip(outputs, expressions)],
+            f"    return ({', '.join(variables[pin] for pin in outputs)},)",
+        ]
+    )
+    namespace = {"alu": alu}
+    exec(source, namespace)
+
+    attributes = {"name": name, "inputs": inputs, "outputs": outputs, "expressions": expressions}
+    return type(name, (BuiltinChip,), {**attributes, "evaluate": namespace["evaluate"]})
+
+
+class Register(BuiltinChip):
+    name = "Register"
+    inputs = {"in": 16, "load": 1}
+    outputs = {"out": 16}
+    clocked = ("in", "load")
+
+    def __init__(self):
+        self.value = self.next_value = 0
+
+    def evaluate(self) -> tuple:
+        return (self.value,)
+
+    def latch(self, value: int, load: int):
+        if load:
+            self.next_value = value
+
+    def commit(self):
+        self.value = self.next_value
+
+    def __getitem__(self, index: int) -> int:
+        # the stored value changes on the rising clock, only out waits for it to fall
+        return self.next_value
+
+    def __setitem__(self, index: int, value: int):
+        self.value = self.next_value = value & WORD_MASK
+
+
+class ARegister(Register):
+    name = "ARegister"
+
+
+class DRegister(Register):
+    name = "DRegister"
+
+
+class Bit(Register):
+    name = "Bit"
+    inputs = {"in": 1, "load": 1}
+    outputs = {"out": 1}
+
+    def __setitem__(self, index: int, value: int):
+        self.value = self.next_value = value & 1
+
+
+class DFF(Bit):
+    name = "DFF"
+    inputs = {"in": 1}
+    clocked = ("in",)
+
+    def latch(self, value: int):
+        self.next_value = value
+
+
+class PC(Register):
+    name = "PC"
+    inputs = {"in": 16, "load": 1, "inc": 1, "reset": 1}
+    clocked = ("in", "load", "inc", "reset")
+
+    def latch(self, value: int, load: int, inc: int, reset: int):
+        if reset:
+            self.next_value = 0
+        elif load:
+            self.next_value = value
+        elif inc:
+            self.next_value = (self.value + 1) & WORD_MASK
+        else:
+            self.next_value = self.value
+
+
+class RAM(BuiltinChip):
+    """Memory of 2**address_width words, reads are combinational and writes land on the clock."""
+
+    address_width = 0
+    clocked = ("in", "load")
+    outputs = {"out": 16}
+
+    def __init__(self):
+        self.memory = [0] * (1 << self.address_width)
+        self.pending = None
+
+    def evaluate(self, address: int) -> tuple:
+        return (self.memory[address],)
+
+    def latch(self, value: int, load: int, address: int):
+        self.pending = (address, value) if load else None
+
+    def commit(self):
+        if self.pending:
+            address, value = self.pending
+            self.memory[address] = value
+            self.pending = None
+
+    def __getitem__(self, index: int) -> int:
+        return self.memory[index]
+
+    def __setitem__(self, index: int, value: int):
+        self.memory[index] = value & WORD_MASK
+
+
+def ram_chip(name: str, address_width: int) -> type:
+    inputs = {"in": 16, "load": 1, "address": address_width}
+    return type(name, (RAM,), {"name": name, "address_width": address_width, "inputs": inputs})
+
+
+RAM8 = ram_chip("RAM8", 3)
+RAM64 = ram_chip("RAM64", 6)
+RAM512 = ram_chip("RAM512", 9)
+RAM4K = ram_chip("RAM4K", 12)
+RAM16K = ram_chip("RAM16K", 14)
+Screen = ram_chip("Screen", 13)
+
+
+class Keyboard(BuiltinChip):
+    """Outputs the key held down, which test scripts set through Keyboard[]."""
+
+    name = "Keyboard"
+    inputs = {}
+    outputs = {"out": 16}
+
+    def __init__(self):
+        self.key = 0
+
+    def evaluate(self) -> tuple:
+        return (self.key,)
+
+    def __getitem__(self, index: int) -> int:
+        return self.key
+
+    def __setitem__(self, index: int, value: int):
+        self.key = value & WORD_MASK
+
+
+class ROM32K(BuiltinChip):
+    name = "ROM32K"
+    inputs = {"address": 15}
+    outputs = {"out": 16}
+
+    def __init__(self):
+        self.memory = [0] * 32768
+
+    def load(self, hack_file: str):
+        """Loads a .hack program, the rest of the ROM is cleared."""
+        with open(hack_file) as file:
+            words = [int(line, 2) for line in map(str.strip, file) if line]
+
+        if len(words) > len(self.memory):
+            raise ValueError(f"{hack_file} does not fit in ROM32K")
+
+        self.memory = words + [0] * (len(self.memory) - len(words))
+
+    def evaluate(self, address: int) -> tuple:
+        return (self.memory[address],)
+
+    def __getitem__(self, index: int) -> int:
+        return self.memory[index]
+
+    def __setitem__(self, index: int, value: int):
+        self.memory[index] = value & WORD_MASK
+
+
+class Memory(BuiltinChip):
+    """RAM16K, Screen and Keyboard mapped into one 15 bit address space."""
+
+    name = "Memory"
+    inputs = {"in": 16, "load": 1, "address": 15}
+    outputs = {"out": 16}
+    clocked = ("in", "load")
+
+    def __init__(self):
+        self.ram, self.screen, self.keyboard = RAM16K(), Screen(), Keyboard()
+
+    def parts(self) -> list:
+        return [self.ram, self.screen, self.keyboard]
+
+    def evaluate(self, address: int) -> tuple:
+        if address < SCREEN_BASE:
+            return (self.ram.memory[address],)
+        if address < KEYBOARD_ADDRESS:
+            return (self.screen.memory[address - SCREEN_BASE],)
+        return (self.keyboard.key if address == KEYBOARD_ADDRESS else 0,)
+
+    def latch(self, value: int, load: int, address: int):
+        if address < SCREEN_BASE:
+            self.ram.latch(value, load, address)
+        elif address < KEYBOARD_ADDRESS:
+            self.screen.latch(value, load, address - SCREEN_BASE)
+
+    def commit(self):
+        self.ram.commit()
+        self.screen.commit()
+
+    def __getitem__(self, index: int) -> int:
+        return self.evaluate(index)[0]
+
+    def __setitem__(self, index: int, value: int):
+        if index < SCREEN_BASE:
+            self.ram[index] = value
+        elif index < KEYBOARD_ADDRESS:
+            self.screen[index - SCREEN_BASE] = value
+
+
+class CPU(BuiltinChip):
+    """The Hack CPU with its ARegister, DRegister and PC as parts."""
+
+    name = "CPU"
+    inputs = {"inM": 16, "instruction": 16, "reset": 1}
+    outputs = {"outM": 16, "writeM": 1, "addressM": 15, "pc": 15}
+    clocked = ("reset",)
+    registered = ("addressM", "pc")
+
+    def __init__(self):
+        self.a_register, self.d_register, self.pc = ARegister(), DRegister(), PC()
+
+    def parts(self) -> list:
+        return [self.a_register, self.d_register, self.pc]
+
+    def __compute(self, in_m: int, instruction: int) -> int:
+        y = in_m if instruction & 0x1000 else self.a_register.value
+        bits = [instruction >> shift & 1 for shift in range(11, 5, -1)]
+        return alu(self.d_register.value, y, *bits)
+
+    def evaluate(self, in_m: int, instruction: int) -> tuple:
+        is_c_instruction = instruction >> 15
+        out_m = self.__compute(in_m, instruction) if is_c_instruction else 0
+        write_m = is_c_instruction & (instruction >> 3 & 1)
+        return (out_m, write_m, *self.registered_outputs())
+
+    def registered_outputs(self) -> tuple:
+        return self.a_register.value & 0x7FFF, self.pc.value & 0x7FFF
+
+    def latch(self, in_m: int, instruction: int, reset: int):
+        a = self.a_register.value
+
+        if not instruction >> 15:
+            self.a_register.latch(instruction, 1)
+            self.d_register.latch(0, 0)
+            self.pc.latch(a, 0, 1, reset)
+            return
+
+        out = self.__compute(in_m, instruction)
+        negative, zero = out >> 15, out == 0
+        jump = (
+            (instruction & 4 and negative)
+            or (instruction & 2 and zero)
+            or (instruction & 1 and not negative and not zero)
+        )
+
+        self.a_register.latch(out, instruction >> 5 & 1)
+        self.d_register.latch(out, instruction >> 4 & 1)
+        self.pc.latch(a, 1 if jump else 0, 1, reset)
+
+    def commit(self):
+        self.a_register.commit()
+        self.d_register.commit()
+        self.pc.commit()
+
+
+BUILTIN_CHIPS = {
+    **{name: combinational_chip(name, *definition) for name, definition in COMBINATIONAL_CHIPS.items()},
+    **{chip.name: chip for chip in (DFF, Bit, Register, ARegister, DRegister, PC, RAM8, RAM64, RAM512, RAM4K, RAM16K)},
+    **{chip.name: chip for chip in (Screen, Keyboard, ROM32K, Memory, CPU)},
+}
+
+# chips with no builtin of their own that stand in for unfinished hdl by wiring up builtin chips
+COMPOSITE_BUILTINS = {
+    "Computer": """
+        CHIP Computer {
+            IN reset;
+            PARTS:
+            ROM32K(address=pc, out=instruction);
+            CPU(inM=inM, instruction=instruction, reset=reset, outM=outM, writeM=writeM, addressM=addressM, pc=pc);
+            Memory(in=outM, load=writeM, address=addressM, out=inM);
+        }
+    """,
+}
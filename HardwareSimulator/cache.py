@@ -0,0 +1,51 @@
+from netlist import COMPILER_VERSION
+from filecache import DEFAULT_CACHE_SIZE, FileCache, hash_file
+import hashlib
+import json
+import os
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "HardwareSimulator")
+
+
+def file_digest(path: str) -> str:
+    return hash_file(path).hexdigest() if path is not None else None
+
+
+class CompiledChipCache(FileCache):
+    """Store of compiled chips.
+
+    An entry records the hdl file every chip in the hierarchy was found in and its hash, and
+    is only used while each chip name still leads to the same file with the same content.
+    """
+
+    def key(self, name: str, library) -> str:
+        search_dirs = [os.path.abspath(directory) for directory in library.search_dirs]
+        options = [COMPILER_VERSION, name, str(library.builtin_stubs), *search_dirs]
+        return hashlib.sha256(":".join(options).encode()).hexdigest()
+
+    def load(self, key: str, library):
+        """Returns the compiled chip for key, None on a cache miss or when a chip it uses changed."""
+        try:
+            with open(self.entry(key)) as file:
+                compiled = json.load(file)
+        except FileNotFoundError:
+            return None
+
+        for name, (path, digest) in compiled["dependencies"].items():
+            located = library.locate(name)
+
+            if located != path or (path is not None and file_digest(path) != digest):
+                return None
+
+        self.touch(key)
+        return compiled
+
+    def store(self, key: str, compiled: dict):
+        dependencies = {name: (path, file_digest(path)) for name, path in compiled["dependencies"].items()}
+
+        def write_entry(entry):
+            with open(entry, "w") as file:
+                json.dump({**compiled, "dependencies": dependencies}, file)
+
+        self.write(key, write_entry)
@@ -0,0 +1,197 @@
+import re
+
+
+TOKEN_PATTERN = re.compile(r"\s+|//[^\n]*|/\*.*?\*/|(\.\.|[A-Za-z_][\w.]*|\d+|[{}()\[\];,=:])", re.DOTALL)
+
+
+class PinRange:
+    """Bits low..high of a pin or signal, high is None while the full width is meant."""
+
+    __slots__ = ("name", "low", "high")
+
+    def __init__(self, name: str, low: int = 0, high: int = None):
+        self.name = name
+        self.low = low
+        self.high = high
+
+    def is_full(self) -> bool:
+        return self.high is None
+
+    def width(self, full_width: int) -> int:
+        return full_width if self.high is None else self.high - self.low + 1
+
+    def __repr__(self) -> str:
+        return self.name if self.high is None else f"{self.name}[{self.low}..{self.high}]"
+
+
+class Part:
+    """A chip used inside a CHIP definition, connections are (part pin, signal) PinRange pairs."""
+
+    __slots__ = ("chip_name", "connections")
+
+    def __init__(self, chip_name: str, connections: list):
+        self.chip_name = chip_name
+        self.connections = connections
+
+
+class ChipDefinition:
+    __slots__ = ("name", "inputs", "outputs", "parts", "builtin", "clocked", "path")
+
+    def __init__(self, name: str, inputs: dict, outputs: dict, parts: list, builtin: str = None, clocked=(), path: str = None):
+        self.name = name
+        self.inputs = inputs
+        self.outputs = outputs
+        self.parts = parts
+        self.builtin = builtin
+        self.clocked = set(clocked)
+        self.path = path
+
+    def is_stub(self) -> bool:
+        """Chips whose PARTS section is still empty, like the unsolved project skeletons."""
+        return not self.parts and not self.builtin
+
+
+def tokenize(source: str) -> list:
+    tokens = []
+    position = 0
+
+    while position < len(source):
+        match = TOKEN_PATTERN.match(source, position)
+
+        if not match:
+            line = source.count("\n", 0, position) + 1
+            raise ValueError(f"Unexpected character {source[position]!r} on line {line}")
+
+        if match.group(1):
+            tokens.append(match.group(1))
+        position = match.end()
+
+    return tokens
+
+
+class HDLParser:
+    """Parses the CHIP definition of a .hdl file or source string."""
+
+    def __init__(self, input_file: str = None, source: str = None):
+        if source is None:
+            if not input_file:
+                raise ValueError("Either input file or hdl source must be provided.")
+
+            with open(input_file) as file:
+                source = file.read()
+
+        self.path = input_file
+        self.tokens = tokenize(source)
+        self.position = 0
+
+    def parse(self) -> ChipDefinition:
+        self.__expect("CHIP")
+        name = self.__next()
+        self.__expect("{")
+
+        inputs, outputs, parts, builtin, clocked = {}, {}, [], None, []
+
+        while self.__peek() != "}":
+            keyword = self.__next()
+
+            if keyword == "IN":
+                inputs = self.__pin_declarations()
+            elif keyword == "OUT":
+                outputs = self.__pin_declarations()
+            elif keyword == "PARTS":
+                self.__expect(":")
+                while self.__peek() not in ("}", "BUILTIN", "CLOCKED"):
+                    parts.append(self.__part())
+            elif keyword == "BUILTIN":
+                builtin = self.__next()
+                self.__expect(";")
+            elif keyword == "CLOCKED":
+                clocked = list(self.__pin_declarations())
+            else:
+                raise ValueError(f"{self.__where()}: expected IN, OUT, PARTS, BUILTIN or CLOCKED but found {keyword}")
+
+        self.__expect("}")
+        return ChipDefinition(name, inputs, outputs, parts, builtin, clocked, self.path)
+
+    def __pin_declarations(self) -> dict:
+        pins = {}
+
+        while True:
+            name = self.__next()
+            width = 1
+
+            if self.__peek() == "[":
+                self.__next()
+                width = int(self.__next())
+                self.__expect("]")
+
+            pins[name] = width
+
+            if self.__next() == ";":
+                return pins
+
+            self.__back(",")
+
+    def __part(self) -> Part:
+        chip_name = self.__next()
+        self.__expect("(")
+        connections = []
+
+        while True:
+            pin = self.__pin_range()
+            self.__expect("=")
+            signal = self.__pin_range()
+            connections.append((pin, signal))
+
+            if self.__next() == ")":
+                break
+
+            self.__back(",")
+
+        self.__expect(";")
+        return Part(chip_name, connections)
+
+    def __pin_range(self) -> PinRange:
+        name = self.__next()
+
+        if self.__peek() != "[":
+            return PinRange(name)
+
+        self.__next()
+        low = high = int(self.__next())
+
+        if self.__peek() == "..":
+            self.__next()
+            high = int(self.__next())
+
+        self.__expect("]")
+        return PinRange(name, low, high)
+
+    def __where(self) -> str:
+        return self.path or "hdl source"
+
+    def __peek(self) -> str:
+        if self.position == len(self.tokens):
+            raise ValueError(f"{self.__where()}: unexpected end of file")
+
+        return self.tokens[self.position]
+
+    def __next(self) -> str:
+        token = self.__peek()
+        self.position += 1
+        return token
+
+    def __back(self, expected: str):
+        """Checks the token just consumed was the separator expected."""
+        if self.tokens[self.position - 1] != expected:
+            raise ValueError(f"{self.__where()}: expected {expected} but found {self.tokens[self.position - 1]}")
+
+    def __expect(self, expected: str):
+        token = self.__next()
+
+        if token != expected:
+            raise ValueError(f"{self.__where()}: expected {expected} but found {token}")
+
+
+def parse_hdl(input_file: str) -> ChipDefinition:
+    return HDLParser(input_file).parse()
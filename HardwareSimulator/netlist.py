@@ -0,0 +1,337 @@
+from builtinchips import BUILTIN_CHIPS, alu
+from hdlparser import ChipDefinition
+from simulator import CONSTANTS
+from collections import deque
+
+
+COMPILER_VERSION = "1.0"
+
+
+class Netlist:
+    """A chip flattened down to builtin chips, with every signal of every instance as a numbered net.
+
+    Nodes are ("gather", net, pieces) for a net assembled from bit ranges of other nets, where
+    a piece is (net or constant, low bit, mask, target low bit), ("gate", chip class, input nets,
+    output nets) for combinational builtins and ("state", part index, evaluated input nets, all
+    input nets, output nets) for builtins with state, whose classes are kept in parts. Their
+    registered outputs come from a separate ("registered", part index, [], output nets) node and
+    are None among the outputs of the state node.
+    """
+
+    def __init__(self):
+        self.widths = []
+        self.nodes = []
+        self.parts = []
+        self.dependencies = {}
+
+    def net(self, width: int) -> int:
+        self.widths.append(width)
+        return len(self.widths) - 1
+
+
+def gather(netlist: Netlist, pieces: list, width: int) -> int:
+    net = netlist.net(width)
+    netlist.nodes.append(("gather", net, pieces))
+    return net
+
+
+def flatten(netlist: Netlist, chip, library, input_nets: list) -> list:
+    """Adds chip, driven by input_nets, to the netlist and returns the nets of its outputs."""
+    if not isinstance(chip, ChipDefinition):
+        output_nets = [netlist.net(width) for width in chip.outputs.values()]
+
+        if getattr(chip, "expressions", None):
+            netlist.nodes.append(("gate", chip, input_nets, output_nets))
+        else:
+            part = len(netlist.parts)
+            evaluated = [net for pin, net in zip(chip.inputs, input_nets) if pin not in chip.clocked]
+            registered = [net for pin, net in zip(chip.outputs, output_nets) if pin in chip.registered]
+            combinational = [None if pin in chip.registered else net for pin, net in zip(chip.outputs, output_nets)]
+
+            if registered:
+                netlist.nodes.append(("registered", part, [], registered))
+            netlist.nodes.append(("state", part, evaluated, input_nets, combinational))
+            netlist.parts.append(chip)
+
+        return output_nets
+
+    signals = dict(zip(chip.inputs, input_nets))
+    widths = {**chip.inputs, **chip.outputs}
+    parts = []
+
+    for part in chip.parts:
+        part_chip = library.resolve(part.chip_name)
+        netlist.dependencies.setdefault(part.chip_name, library.locate(part.chip_name))
+        parts.append(part_chip)
+
+        for pin, signal in part.connections:
+            if pin.name in part_chip.outputs and signal.name not in chip.outputs:
+                width = pin.width(part_chip.outputs[pin.name])
+                widths[signal.name] = max(widths.get(signal.name, 0), signal.low + width)
+
+    # nets driven from inside the chip are gathered after all parts are flattened, so parts can be
+    # wired to signals defined further down, reads of them go through placeholders until then
+    driven = {name: [] for name in widths if name not in signals}
+    placeholders = {name: netlist.net(width) for name, width in widths.items() if name not in signals}
+    signals.update(placeholders)
+
+    for part, part_chip in zip(chip.parts, parts):
+        pin_pieces = {pin: [] for pin in part_chip.inputs}
+        outputs = []
+
+        for pin, signal in part.connections:
+            if pin.name in pin_pieces:
+                mask = (1 << pin.width(part_chip.inputs[pin.name])) - 1
+
+                if signal.name not in signals and signal.name not in CONSTANTS:
+                    raise ValueError(f"{chip.path or chip.name}: {part.chip_name} reads {signal.name}, which nothing drives")
+
+                source = signal.name if signal.name in CONSTANTS else signals[signal.name]
+                pin_pieces[pin.name].append((source, signal.low, mask, pin.low))
+            elif pin.name in part_chip.outputs:
+                outputs.append((list(part_chip.outputs).index(pin.name), pin, signal))
+            else:
+                raise ValueError(f"{chip.path or chip.name}: {part.chip_name} has no pin named {pin.name}")
+
+        pin_nets = [gather(netlist, pin_pieces[pin], width) for pin, width in part_chip.inputs.items()]
+        output_nets = flatten(netlist, part_chip, library, pin_nets)
+
+        for index, pin, signal in outputs:
+            mask = (1 << pin.width(part_chip.outputs[pin.name])) - 1
+            driven[signal.name].append((output_nets[index], pin.low, mask, signal.low))
+
+    for name, net in placeholders.items():
+        netlist.nodes.append(("gather", net, driven[name]))
+
+    return [signals[pin] for pin in chip.outputs]
+
+
+def piece_source(piece: tuple, widths: list) -> str:
+    source, low, mask, target_low = piece
+
+    if source == "true":
+        return str(mask << target_low)
+
+    term = f"n{source}"
+    if low:
+        term = f"({term} >> {low})"
+    if low or widths[source] > mask.bit_length():
+        term = f"({term} & {mask})"
+    if target_low:
+        term = f"({term} << {target_low})"
+
+    return term
+
+
+class NetlistCompiler:
+    """Levelizes a netlist and generates the python source of straight-line evaluate, latch and commit functions.
+
+    Single piece gathers are folded into their readers first, then nodes are ordered so each
+    comes after the nodes driving its inputs. The inputs of builtins with state that are only
+    clocked do not count, which is what breaks the loops through registers and memories.
+    Nodes driving neither an output nor a clocked input are left out.
+    """
+
+    def __init__(self, netlist: Netlist, input_nets: list, output_nets: list, name: str):
+        self.netlist = netlist
+        self.input_nets = input_nets
+        self.output_nets = output_nets
+        self.name = name
+
+    def __fold_aliases(self) -> list:
+        aliases = {}
+        nodes = []
+
+        for node in self.netlist.nodes:
+            if node[0] == "gather" and len(node[2]) == 1:
+                source, low, mask, target_low = node[2][0]
+                if source not in CONSTANTS and low == target_low == 0 and self.netlist.widths[source] == mask.bit_length():
+                    aliases[node[1]] = source
+                    continue
+            nodes.append(node)
+
+        def resolve(net):
+            while net in aliases:
+                net = aliases[net]
+            return net
+
+        def resolve_pieces(pieces):
+            return [(piece[0] if piece[0] in CONSTANTS else resolve(piece[0]), *piece[1:]) for piece in pieces]
+
+        self.output_nets = [resolve(net) for net in self.output_nets]
+        folded = []
+
+        for node in nodes:
+            if node[0] == "gather":
+                folded.append(("gather", node[1], resolve_pieces(node[2])))
+            elif node[0] in ("gate", "registered"):
+                folded.append((node[0], node[1], [resolve(net) for net in node[2]], node[3]))
+            else:
+                folded.append(("state", node[1], [resolve(net) for net in node[2]], [resolve(net) for net in node[3]], node[4]))
+
+        return folded
+
+    @staticmethod
+    def __reads(node: tuple) -> list:
+        if node[0] == "gather":
+            return [piece[0] for piece in node[2] if piece[0] not in CONSTANTS]
+        return node[2]
+
+    @staticmethod
+    def __writes(node: tuple) -> list:
+        return [node[1]] if node[0] == "gather" else [net for net in node[-1] if net is not None]
+
+    def levelize(self) -> list:
+        nodes = self.__fold_aliases()
+        drivers = {net: index for index, node in enumerate(nodes) for net in self.__writes(node)}
+
+        # only what reaches an output or a clocked input is worth computing
+        needed = set(self.output_nets)
+        for node in nodes:
+            if node[0] == "state":
+                needed.update(node[3])
+
+        live = set()
+        pending = [drivers[net] for net in needed if net in drivers]
+        while pending:
+            index = pending.pop()
+            if index not in live:
+                live.add(index)
+                pending.extend(drivers[net] for net in self.__reads(nodes[index]) if net in drivers)
+
+        waiting = {}
+        users = {}
+        for index in sorted(live):
+            inputs = {drivers[net] for net in self.__reads(nodes[index]) if net in drivers}
+            waiting[index] = len(inputs)
+            for driver in inputs:
+                users.setdefault(driver, []).append(index)
+
+        ready = deque(index for index, count in waiting.items() if count == 0)
+        order = []
+
+        while ready:
+            index = ready.popleft()
+            order.append(nodes[index])
+
+            for user in users.get(index, ()):
+                waiting[user] -= 1
+                if waiting[user] == 0:
+                    ready.append(user)
+
+        if len(order) != len(live):
+            raise ValueError(f"{self.name} has a combinational loop, its parts can not be put in order")
+
+        self.clocked = [node for node in nodes if node[0] == "state"]
+        return order
+
+    def source(self) -> str:
+        order = self.levelize()
+        widths = self.netlist.widths
+        latched = sorted({net for node in self.clocked for net in node[3]})
+        lines = [
+            "def build(parts):",
+            "    pending = [()]",
+            "",
+            f"    def evaluate({', '.join(f'n{net}' for net in self.input_nets)}):",
+        ]
+
+        for node in order:
+            if node[0] == "gather":
+                terms = [piece_source(piece, widths) for piece in node[2] if piece[0] != "false"]
+                lines.append(f"        n{node[1]} = {' | '.join(terms) or '0'}")
+            elif node[0] == "gate":
+                _, chip, input_nets, output_nets = node
+                variables = {pin: f"n{net}" for pin, net in zip((*chip.inputs, *chip.outputs), (*input_nets, *output_nets))}
+                for net, expression in zip(output_nets, chip.expressions):
+                    lines.append(f"        n{net} = {expression.format(**variables)}")
+            elif node[0] == "registered":
+                lines.append(f"        {''.join(f'n{net}, ' for net in node[3])}= parts[{node[1]}].registered_outputs()")
+            else:
+                _, part, evaluated, _, output_nets = node
+                targets = "".join("_, " if net is None else f"n{net}, " for net in output_nets)
+                lines.append(f"        {targets}= parts[{part}].evaluate({', '.join(f'n{net}' for net in evaluated)})")
+
+        if latched:
+            lines.append(f"        pending[0] = ({''.join(f'n{net}, ' for net in latched)})")
+        lines.append(f"        return ({''.join(f'n{net}, ' for net in self.output_nets)})")
+
+        lines += ["", "    def latch(*values):"]
+        if latched:
+            lines.append(f"        {''.join(f'n{net}, ' for net in latched)}= pending[0]")
+        for _, part, _, input_nets, _ in self.clocked:
+            lines.append(f"        parts[{part}].latch({', '.join(f'n{net}' for net in input_nets)})")
+        lines.append("        pass")
+
+        lines += ["", "    def commit():"]
+        for _, part, *_ in self.clocked:
+            lines.append(f"        parts[{part}].commit()")
+        lines.append("        pass")
+
+        lines += ["", "    return evaluate, latch, commit", ""]
+        return "\n".join(lines)
+
+
+def compile_chip(definition: ChipDefinition, library) -> dict:
+    """Flattens and compiles a chip, returning what CompiledChip needs to run it.
+
+    That is the generated source, the builtin chips with state in the order the source refers to
+    them, the pins and the hdl file of every chip used, for caches to tell when it is stale.
+    """
+    netlist = Netlist()
+    input_nets = [netlist.net(width) for width in definition.inputs.values()]
+    output_nets = flatten(netlist, definition, library, input_nets)
+    source = NetlistCompiler(netlist, input_nets, output_nets, definition.name).source()
+
+    return {
+        "name": definition.name,
+        "inputs": definition.inputs,
+        "outputs": definition.outputs,
+        "source": source,
+        "parts": [part.name for part in netlist.parts],
+        "dependencies": {definition.name: definition.path, **netlist.dependencies},
+    }
+
+
+class CompiledChip:
+    """Runs a chip through the code compile_chip generated for it, same interface as simulator.Chip."""
+
+    clocked = ()
+
+    def __init__(self, compiled: dict):
+        self.name = compiled["name"]
+        self.inputs = compiled["inputs"]
+        self.outputs = compiled["outputs"]
+        self.part_list = [BUILTIN_CHIPS[name]() for name in compiled["parts"]]
+
+        namespace = {"alu": alu}
+        exec(compile(compiled["source"], f"<compiled {self.name}>", "exec"), namespace)
+        self.evaluate, self.latch, self.commit = namespace["build"](self.part_list)
+
+    def parts(self) -> list:
+        return self.part_list
+
+    def __getitem__(self, index: int) -> int:
+        raise ValueError(f"{self.name} is not a builtin chip and has no internal state")
+
+    def __setitem__(self, index: int, value: int):
+        raise ValueError(f"{self.name} is not a builtin chip and has no internal state")
+
+
+def build_chip(name: str, library, cache=None):
+    """The chip ready to run: builtin chips as they are, hdl chips compiled or taken from the cache."""
+    chip = library.resolve(name)
+
+    if not isinstance(chip, ChipDefinition):
+        return chip()
+
+    key = cache.key(name, library) if cache else None
+    compiled = cache.load(key, library) if cache else None
+
+    if compiled is None:
+        compiled = compile_chip(chip, library)
+
+        if cache:
+            cache.store(key, compiled)
+
+    return CompiledChip(compiled)
@@ -0,0 +1,177 @@
+from builtinchips import BUILTIN_CHIPS, COMPOSITE_BUILTINS
+from hdlparser import ChipDefinition, HDLParser, parse_hdl
+from collections import deque
+import os
+
+
+CONSTANTS = {"true", "false"}
+
+
+class Chip:
+    """Interprets an hdl chip by evaluating its parts over a table of signal values.
+
+    Parts are evaluated in the order they are written, again and again until no signal changes,
+    so the order of the PARTS section does not matter. A chip takes all of its inputs on
+    evaluate, unlike builtin chips which leave out their clocked ones.
+    """
+
+    clocked = ()
+
+    def __init__(self, definition, library):
+        self.name = definition.name
+        self.inputs = definition.inputs
+        self.outputs = definition.outputs
+        self.widths = {**definition.inputs, **definition.outputs}
+        self.part_routes = []
+
+        for part in definition.parts:
+            chip = library.instantiate(part.chip_name)
+            input_routes = {pin: [] for pin in chip.inputs}
+            output_routes = []
+
+            for pin, signal in part.connections:
+                if pin.name in chip.inputs:
+                    width = pin.width(chip.inputs[pin.name])
+                    input_routes[pin.name].append((signal.name, signal.low, (1 << width) - 1, pin.low))
+                elif pin.name in chip.outputs:
+                    width = pin.width(chip.outputs[pin.name])
+                    output_routes.append((list(chip.outputs).index(pin.name), pin.low, (1 << width) - 1, signal.name, signal.low))
+
+                    if signal.name not in definition.outputs:
+                        self.widths[signal.name] = max(self.widths.get(signal.name, 0), signal.low + width)
+                else:
+                    raise ValueError(f"{definition.path or self.name}: {part.chip_name} has no pin named {pin.name}")
+
+            evaluated = [routes for pin, routes in input_routes.items() if pin not in chip.clocked]
+            self.part_routes.append((chip, evaluated, list(input_routes.values()), output_routes))
+
+        for chip, _, routes, _ in self.part_routes:
+            for signal in (route[0] for pin_routes in routes for route in pin_routes):
+                if signal not in self.widths and signal not in CONSTANTS:
+                    raise ValueError(f"{definition.path or self.name}: {chip.name} reads {signal}, which nothing drives")
+
+        self.signals = dict.fromkeys(self.widths, 0)
+
+    def parts(self) -> list:
+        return [part[0] for part in self.part_routes]
+
+    def __gather(self, routes: list) -> list:
+        signals = self.signals
+        values = []
+
+        for pin_routes in routes:
+            value = 0
+
+            for signal, signal_low, mask, pin_low in pin_routes:
+                if signal == "true":
+                    value |= mask << pin_low
+                elif signal != "false":
+                    value |= (signals[signal] >> signal_low & mask) << pin_low
+
+            values.append(value)
+
+        return values
+
+    def evaluate(self, *values) -> tuple:
+        signals = self.signals
+        signals.update(zip(self.inputs, values))
+
+        for _ in range(len(self.part_routes) + 1):
+            changed = False
+
+            for chip, evaluated, _, output_routes in self.part_routes:
+                outputs = chip.evaluate(*self.__gather(evaluated))
+
+                for index, pin_low, mask, signal, signal_low in output_routes:
+                    old = signals[signal]
+                    new = old & ~(mask << signal_low) | (outputs[index] >> pin_low & mask) << signal_low
+
+                    if new != old:
+                        signals[signal] = new
+                        changed = True
+
+            if not changed:
+                return tuple(signals[pin] for pin in self.outputs)
+
+        raise ValueError(f"{self.name} does not settle, its parts form a combinational loop")
+
+    def latch(self, *values):
+        """Clocks the parts on the signals of the evaluate that has to come right before."""
+        for chip, _, routes, _ in self.part_routes:
+            chip.latch(*self.__gather(routes))
+
+    def commit(self):
+        for chip, *_ in self.part_routes:
+            chip.commit()
+
+    def __getitem__(self, index: int) -> int:
+        raise ValueError(f"{self.name} is not a builtin chip and has no internal state")
+
+    def __setitem__(self, index: int, value: int):
+        raise ValueError(f"{self.name} is not a builtin chip and has no internal state")
+
+
+class ChipLibrary:
+    """Finds chips by name in the search directories, falling back to the builtin chips.
+
+    With builtin_stubs set, chips whose hdl has no parts yet are simulated by their builtin
+    implementation as well, so test scripts can run against unfinished projects.
+    """
+
+    def __init__(self, search_dirs: list, builtin_stubs: bool = False):
+        self.search_dirs = search_dirs
+        self.builtin_stubs = builtin_stubs
+        self.definitions = {}
+
+    def locate(self, name: str):
+        """The hdl file of the chip in the first search directory that has one, None if there is none."""
+        for directory in self.search_dirs:
+            hdl_file = os.path.join(directory, f"{name}.hdl")
+
+            if os.path.isfile(hdl_file):
+                return hdl_file
+
+        return None
+
+    def definition(self, name: str):
+        if name not in self.definitions:
+            hdl_file = self.locate(name)
+            self.definitions[name] = parse_hdl(hdl_file) if hdl_file else None
+
+        return self.definitions[name]
+
+    def resolve(self, name: str):
+        """The ChipDefinition to build the chip from, or its builtin chip class."""
+        definition = self.definition(name)
+
+        if definition and definition.builtin:
+            name = definition.builtin
+        elif definition and not (self.builtin_stubs and definition.is_stub()):
+            return definition
+
+        if name in BUILTIN_CHIPS:
+            return BUILTIN_CHIPS[name]
+        if name in COMPOSITE_BUILTINS:
+            return HDLParser(source=COMPOSITE_BUILTINS[name]).parse()
+        if definition:
+            return definition
+
+        raise ValueError(f"Chip {name} is neither found in {', '.join(self.search_dirs)} nor a builtin chip")
+
+    def instantiate(self, name: str):
+        chip = self.resolve(name)
+        return Chip(chip, self) if isinstance(chip, ChipDefinition) else chip()
+
+
+def find_part(chip, name: str):
+    """The part nearest to chip, or chip itself, that is a chip of the given name."""
+    pending = deque([chip])
+
+    while pending:
+        part = pending.popleft()
+
+        if part.name == name:
+            return part
+        pending.extend(part.parts())
+
+    raise ValueError(f"{chip.name} has no part named {name}")
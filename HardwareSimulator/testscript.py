@@ -0,0 +1,282 @@
+from netlist import build_chip
+from simulator import ChipLibrary, find_part
+import os
+import re
+
+
+TOKEN_PATTERN = re.compile(r'\s+|//[^\n]*|/\*.*?\*/|("[^"]*"|[,;{}]|[^\s,;{}"]+)', re.DOTALL)
+OUTPUT_SPEC_PATTERN = re.compile(r"^([^%\[]+)(\[(\d*)\])?(%([BXDS])(\d+)\.(\d+)\.(\d+))?$")
+HOLD_KEY_PATTERN = re.compile(r"hold down (?:the )?'(.)'", re.IGNORECASE)
+
+# while loops wait on the chip, a loop still going after this many rounds never ends
+WHILE_LIMIT = 1_000_000
+
+CONDITIONS = {
+    "=": lambda a, b: a == b,
+    "<>": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    ">": lambda a, b: a > b,
+    "<=": lambda a, b: a <= b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+class ComparisonFailure(Exception):
+    pass
+
+
+class SkippedScript(Exception):
+    """Raised for scripts that are not meant for the hardware simulator, like the cpu and vm emulator ones."""
+
+
+def tokenize(source: str) -> list:
+    tokens = []
+    position = 0
+
+    while position < len(source):
+        match = TOKEN_PATTERN.match(source, position)
+
+        if match.group(1):
+            tokens.append(match.group(1))
+        position = match.end()
+
+    return tokens
+
+
+def parse_block(tokens: list, position: int = 0) -> tuple:
+    """Groups tokens into commands, each a list of words and the commands of its {} block or None."""
+    commands, words = [], []
+
+    while position < len(tokens):
+        token = tokens[position]
+        position += 1
+
+        if token in (",", ";", "}"):
+            if words:
+                commands.append((words, None))
+                words = []
+
+            if token == "}":
+                return commands, position
+        elif token == "{":
+            body, position = parse_block(tokens, position)
+            commands.append((words, body))
+            words = []
+        else:
+            words.append(token)
+
+    if words:
+        commands.append((words, None))
+
+    return commands, position
+
+
+def parse_value(text: str) -> int:
+    if text.startswith("%B"):
+        return int(text[2:], 2)
+    if text.startswith("%X"):
+        return int(text[2:], 16)
+    if text.startswith("%D"):
+        return int(text[2:])
+    return int(text)
+
+
+def to_signed(value: int, width: int) -> int:
+    return value - (1 << 16) if width == 16 and value >> 15 else value
+
+
+class OutputColumn:
+    """An output-list entry, name%FORMAT left.length.right with format B, X, D or S."""
+
+    def __init__(self, spec: str):
+        match = OUTPUT_SPEC_PATTERN.match(spec)
+
+        if not match:
+            raise ValueError(f"Invalid output-list entry: {spec}")
+
+        name, subscript, index, _, format, left, length, right = match.groups()
+        self.name = name + (subscript or "")
+        self.pin = name
+        self.index = None if subscript is None else int(index or 0)
+        self.format = format or "B"
+        self.left, self.length, self.right = (int(left), int(length), int(right)) if format else (1, 0, 1)
+
+    def header(self) -> str:
+        width = self.left + self.length + self.right
+        name = self.name[:width]
+        padding = (width - len(name)) // 2
+        return " " * padding + name + " " * (width - len(name) - padding)
+
+    def cell(self, value, width: int) -> str:
+        length = self.length or width
+
+        if self.format == "S":
+            text = str(value).ljust(length)
+        elif self.format == "D":
+            text = str(to_signed(value, width)).rjust(length)
+        elif self.format == "X":
+            text = format(value, "X").zfill(length)[-length:]
+        else:
+            text = format(value, "b").zfill(length)[-length:]
+
+        return " " * self.left + text + " " * self.right
+
+
+class TestScript:
+    """Runs a .tst script against a chip and compares its output with the compare-to file.
+
+    Chips are looked up in the directory of the script and then in library_dirs. They are
+    compiled to a netlist, reused from cache when one is supplied, unless interpret is set.
+    With check_outputs unset the compare-to file is ignored and run only returns the output.
+    echo messages asking to hold a key down are answered by holding it on the builtin keyboard.
+    Raises ComparisonFailure on the first output line that does not match.
+    """
+
+    def __init__(
+        self, tst_file: str, library_dirs: list = (), builtin_stubs: bool = False, interpret: bool = False, cache=None,
+        check_outputs: bool = True,
+    ):
+        with open(tst_file) as file:
+            self.commands, _ = parse_block(tokenize(file.read()))
+
+        self.directory = os.path.dirname(os.path.abspath(tst_file))
+        self.library = ChipLibrary([self.directory, *library_dirs], builtin_stubs)
+        self.interpret = interpret
+        self.cache = cache
+        self.check_outputs = check_outputs
+        self.chip = None
+        self.time = 0
+        self.time_text = "0"
+        self.columns = []
+        self.compare_lines = None
+        self.output_lines = []
+
+    def run(self) -> list:
+        """Runs the whole script, returning the lines it output."""
+        self.__run_commands(self.commands)
+
+        if self.compare_lines is not None and len(self.output_lines) < len(self.compare_lines):
+            raise ComparisonFailure(
+                f"Script ended after {len(self.output_lines)} of the {len(self.compare_lines)} lines to compare"
+            )
+
+        return self.output_lines
+
+    def __run_commands(self, commands: list):
+        for words, body in commands:
+            if body is None:
+                self.__run_command(words)
+            elif words[0] == "repeat":
+                for _ in range(int(words[1]) if len(words) > 1 else WHILE_LIMIT):
+                    self.__run_commands(body)
+            elif words[0] == "while":
+                name, operator, value = words[1:4]
+                condition = CONDITIONS[operator]
+                rounds = 0
+
+                while condition(self.__read_signed(name), parse_value(value)):
+                    rounds += 1
+                    if rounds > WHILE_LIMIT:
+                        raise ValueError(f"while {name} {operator} {value} did not end after {WHILE_LIMIT} rounds")
+
+                    self.__run_commands(body)
+            else:
+                raise ValueError(f"Unknown block command: {' '.join(words)}")
+
+    def __run_command(self, words: list):
+        command = words[0]
+
+        if command == "load":
+            if len(words) < 2 or not words[1].endswith(".hdl"):
+                raise SkippedScript("does not load a chip")
+
+            self.__load(words[1][: -len(".hdl")])
+        elif command == "set":
+            self.__set(words[1], parse_value(words[2]))
+        elif command == "eval":
+            self.__evaluate()
+        elif command == "tick":
+            self.__evaluate()
+            self.chip.latch(*self.values.values())
+            self.time_text = f"{self.time}+"
+        elif command == "tock":
+            self.chip.commit()
+            self.__evaluate()
+            self.time += 1
+            self.time_text = str(self.time)
+        elif command == "output":
+            self.__output_line("|" + "|".join(column.cell(*self.__read(column)) for column in self.columns) + "|")
+        elif command == "output-list":
+            self.columns = [OutputColumn(spec) for spec in words[1:]]
+            self.__output_line("|" + "|".join(column.header() for column in self.columns) + "|")
+        elif command == "compare-to" and self.check_outputs:
+            with open(os.path.join(self.directory, words[1])) as file:
+                self.compare_lines = file.read().splitlines()
+        elif command == "echo":
+            key = HOLD_KEY_PATTERN.search(" ".join(words[1:]))
+            if key:
+                find_part(self.chip, "Keyboard")[0] = ord(key.group(1))
+        elif command in ("output-file", "clear-echo", "compare-to"):
+            pass
+        elif len(words) == 3 and words[1] == "load":
+            find_part(self.chip, words[0]).load(os.path.join(self.directory, words[2]))
+        else:
+            raise ValueError(f"Unknown command: {' '.join(words)}")
+
+    def __load(self, name: str):
+        if self.interpret:
+            self.chip = self.library.instantiate(name)
+        else:
+            self.chip = build_chip(name, self.library, self.cache)
+        self.values = dict.fromkeys(self.chip.inputs, 0)
+        self.evaluated = [pin for pin in self.chip.inputs if pin not in self.chip.clocked]
+        self.pins = dict.fromkeys(self.chip.outputs, 0)
+
+    def __evaluate(self):
+        outputs = self.chip.evaluate(*[self.values[pin] for pin in self.evaluated])
+        self.pins = dict(zip(self.chip.outputs, outputs))
+
+    def __set(self, name: str, value: int):
+        pin, _, index = name.partition("[")
+
+        if index:
+            find_part(self.chip, pin)[int(index.rstrip("]") or 0)] = value
+        elif pin in self.values:
+            self.values[pin] = value & (1 << self.chip.inputs[pin]) - 1
+        else:
+            raise ValueError(f"{self.chip.name} has no input pin named {pin}")
+
+    def __read(self, column: OutputColumn) -> tuple:
+        """The value of an output column and its width in bits."""
+        if column.pin == "time":
+            return self.time_text, 0
+
+        if column.index is not None:
+            part = find_part(self.chip, column.pin)
+            return part[column.index], part.outputs.get("out", 16)
+
+        if column.pin in self.values:
+            return self.values[column.pin], self.chip.inputs[column.pin]
+        if column.pin in self.pins:
+            return self.pins[column.pin], self.chip.outputs[column.pin]
+        if column.pin in getattr(self.chip, "signals", ()):
+            return self.chip.signals[column.pin], self.chip.widths[column.pin]
+
+        raise ValueError(f"{self.chip.name} has no pin named {column.pin}")
+
+    def __read_signed(self, name: str) -> int:
+        pin, _, index = name.partition("[")
+        column = OutputColumn(f"{pin}[{index}" if index else pin)
+        return to_signed(*self.__read(column))
+
+    def __output_line(self, line: str):
+        self.output_lines.append(line)
+
+        if self.compare_lines is None:
+            return
+
+        line_number = len(self.output_lines)
+        expected = self.compare_lines[line_number - 1] if line_number <= len(self.compare_lines) else ""
+
+        if len(expected) != len(line) or any(e != "*" and e != c for e, c in zip(expected, line)):
+            raise ComparisonFailure(f"Comparison failure at line {line_number}: expected {expected!r} but got {line!r}")
@@ -0,0 +1,92 @@
+from vmparser import read_commands
+from emulator import VMEmulator
+from jackos import NATIVE_CLASSES
+from ramargs import parse_assignment, parse_range
+import argparse
+import os
+
+
+if __name__ == "__main__":
+    """usage:- python3 VMEmulator.py <path-to-vm file/directory> [--steps N]
+        [--set ADDR=VALUE]... [--dump START:END]... [--native [CLASS ...]]
+        [--input LINE]...
+
+    Runs the vm code directly, starting at Sys.init if it is defined and at the first
+    command otherwise, until Sys.halt is called, Sys.init returns or the step budget is
+    spent. Then prints the stack pointers and the requested RAM ranges.
+
+    --native runs the given OS classes, or all of them, as Python built-ins instead of
+    their vm code. Leave it out to run the Jack implementations. Native Keyboard reads
+    --input lines and the text printed by native Output is shown after the run.
+    """
+    arg_parse = argparse.ArgumentParser()
+    arg_parse.add_argument("vm_file", help="Enter path of vm code file", default="")
+    arg_parse.add_argument(
+        "--steps",
+        type=int,
+        help="Maximum number of vm commands to execute",
+        default=10_000_000,
+    )
+    arg_parse.add_argument(
+        "--set",
+        action="append",
+        type=parse_assignment,
+        help="Preload RAM[ADDR] with VALUE",
+        default=[],
+    )
+    arg_parse.add_argument(
+        "--dump",
+        action="append",
+        type=parse_range,
+        help="Print RAM[START..END]",
+        default=[],
+    )
+    arg_parse.add_argument(
+        "--native",
+        nargs="*",
+        choices=NATIVE_CLASSES,
+        metavar="CLASS",
+        help="OS classes to run natively, all when none are given: "
+        f"{', '.join(NATIVE_CLASSES)}",
+    )
+    arg_parse.add_argument(
+        "--input", action="append", help="Line for native Keyboard to read", default=[]
+    )
+    args = arg_parse.parse_args()
+
+    native_classes = NATIVE_CLASSES if args.native == [] else args.native or ()
+
+    if not os.path.exists(args.vm_file):
+        raise ValueError("Enter a valid vm file path")
+
+    if os.path.isdir(args.vm_file):
+        vm_files = sorted(
+            os.path.join(args.vm_file, file)
+            for file in os.listdir(args.vm_file)
+            if file.endswith(".vm")
+        )
+    else:
+        vm_files = [args.vm_file]
+
+    emulator = VMEmulator(
+        [read_commands(vm_file) for vm_file in vm_files],
+        native_classes=native_classes,
+        input_lines=args.input,
+    )
+
+    for address, value in args.set:
+        emulator.ram[address] = value
+
+    emulator.run(args.steps)
+
+    ram = emulator.ram
+    print(
+        f"steps: {emulator.steps} {'halted' if emulator.halted else 'running'} "
+        f"SP: {ram[0]} LCL: {ram[1]} ARG: {ram[2]}"
+    )
+    for address_range in args.dump:
+        for address in address_range:
+            print(f"RAM[{address}]: {ram[address]}")
+
+    if emulator.os and emulator.os.text():
+        print(emulator.os.text())
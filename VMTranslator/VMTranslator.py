@@ -1,18 +1,180 @@
-from vmparser import Parser
+from vmparser import read_commands
+from cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE, TranslationCache
+from callgraph import (
+    ENTRY_FUNCTION,
+    build_call_graph,
+    reachable_functions,
+    remove_unreachable,
+)
 from codewriter import CodeWriter
+from inliner import DEFAULT_INLINE_THRESHOLD, inline_functions
 from command import Command
+from concurrent.futures import ProcessPoolExecutor
 import argparse
 import os
-import re
+
+
+def translate_commands(code_writer: CodeWriter, commands: list):
+    for command_type, arg1, arg2 in commands:
+        if command_type == Command.C_ARITHMETIC:
+            code_writer.writeArithmetic(arg1)
+        elif command_type == Command.C_POP or command_type == Command.C_PUSH:
+            code_writer.writePushPop(command_type, arg1, arg2)
+        elif command_type == Command.C_LABEL:
+            code_writer.writeLabel(arg1)
+        elif command_type == Command.C_GOTO:
+            code_writer.writeGoto(arg1)
+        elif command_type == Command.C_IF:
+            code_writer.writeIf(arg1)
+        elif command_type == Command.C_CALL:
+            code_writer.writeCall(arg1, arg2)
+        elif command_type == Command.C_FUNCTION:
+            code_writer.writeFunction(arg1, arg2)
+        elif command_type == Command.C_RETURN:
+            code_writer.writeReturn()
+
+
+def translate_file(
+    vm_file: str,
+    commands: list = None,
+    cache_dir: str = None,
+    cache_size: int = DEFAULT_CACHE_SIZE,
+    **options,
+) -> tuple:
+    """Translates one file into memory, its labels scoped to it so it links anywhere.
+
+    The file is parsed here unless its commands are supplied. When a cache_dir is
+    supplied translations of unchanged files are reused. Returns the translation, i.e.
+    the assembly, the shared routines it uses and the number of instructions written
+    before and after peephole optimization, and whether it came from the cache.
+    """
+    cache = key = None
+
+    if cache_dir:
+        cache = TranslationCache(cache_dir, cache_size)
+        key = cache.key(
+            vm_file,
+            commands,
+            *[f"{option}={value}" for option, value in sorted(options.items())],
+        )
+        translation = cache.load(key)
+
+        if translation is not None:
+            return translation, True
+
+    _, file_name = os.path.split(vm_file)
+    code_writer = CodeWriter(**options)
+
+    try:
+        code_writer.setFileName(file_name)
+        translate_commands(
+            code_writer, read_commands(vm_file) if commands is None else commands
+        )
+    except Exception as e:
+        print(e)
+    code_writer.flush()
+
+    translation = (
+        code_writer.assembly(),
+        code_writer.shared_routines,
+        code_writer.instruction_written_count,
+        code_writer.optimized_count,
+    )
+
+    if cache:
+        cache.store(key, translation)
+
+    return translation, False
+
+
+def translate_files(
+    vm_files: list, programs: list = None, jobs: int = None, **options
+) -> list:
+    """Translates in a process pool, returning translate_file results in file order."""
+    if programs is None:
+        programs = [None] * len(vm_files)
+
+    if len(vm_files) == 1 or jobs == 1:
+        return [
+            translate_file(vm_file, commands, **options)
+            for vm_file, commands in zip(vm_files, programs)
+        ]
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(translate_file, vm_file, commands, **options)
+            for vm_file, commands in zip(vm_files, programs)
+        ]
+        return [future.result() for future in futures]
 
 
 if __name__ == "__main__":
-    """usage:- python3 VMTranslator.py <path-to-vm file/directory>
+    """usage:- python3 VMTranslator.py <path-to-vm file/directory> [--optimize]
+        [--compact] [--cache-top] [--prune] [--inline [N]] [--jobs N] [--cache]
 
-    Generates a single .asm file with same file name in location of .vm file or directory name incase that is provided.
+    Generates a single .asm file with same file name in location of .vm file or
+    directory name incase that is provided. The files of a directory are translated in
+    parallel and joined in file name order after the bootstrap code.
+    With --optimize the generated assembly is peephole optimized and the instructions
+    saved are reported.
+    With --compact comparisons, call and return share one routine each, favouring size
+    over speed.
+    With --cache-top the top of the stack is kept in the D register between consecutive
+    commands.
+    With --prune only functions reachable through calls from Sys.init are translated
+    when a directory is provided.
+    With --inline calls to leaf functions of at most N commands are replaced by their
+    body.
+    With --cache translations of files that did not change since they were last
+    translated are reused.
     """
     arg_parse = argparse.ArgumentParser()
     arg_parse.add_argument("vm_file", help="Enter path of vm code file", default="")
+    arg_parse.add_argument(
+        "--optimize",
+        action="store_true",
+        help="Peephole optimize the generated assembly",
+    )
+    arg_parse.add_argument(
+        "--compact",
+        action="store_true",
+        help="Share comparison, call and return routines",
+    )
+    arg_parse.add_argument(
+        "--cache-top",
+        action="store_true",
+        help="Keep the stack top in D between commands",
+    )
+    arg_parse.add_argument(
+        "--prune",
+        action="store_true",
+        help="Leave out functions unreachable from Sys.init",
+    )
+    arg_parse.add_argument(
+        "--inline",
+        type=int,
+        nargs="?",
+        const=DEFAULT_INLINE_THRESHOLD,
+        help="Inline leaf functions of at most N commands "
+        f"(default {DEFAULT_INLINE_THRESHOLD})",
+    )
+    arg_parse.add_argument(
+        "--jobs", type=int, help="Number of worker processes, defaults to the cpu count"
+    )
+    arg_parse.add_argument(
+        "--cache", action="store_true", help="Reuse translations of unchanged files"
+    )
+    arg_parse.add_argument(
+        "--cache-dir",
+        help="Directory of the translation cache",
+        default=DEFAULT_CACHE_DIR,
+    )
+    arg_parse.add_argument(
+        "--cache-size",
+        type=int,
+        help="Size limit of the translation cache in MB",
+        default=DEFAULT_CACHE_SIZE >> 20,
+    )
     args = arg_parse.parse_args()
 
     vm_file = args.vm_file
@@ -21,11 +183,11 @@ if __name__ == "__main__":
     if os.path.isdir(vm_file):
         if vm_file.endswith(os.path.sep):
             vm_file = vm_file[:-1]
-        files_to_translate = [
+        files_to_translate = sorted(
             os.path.join(vm_file, file)
             for file in os.listdir(vm_file)
             if file.endswith("vm")
-        ]
+        )
     else:
         files_to_translate.append(vm_file)
 
@@ -40,41 +202,60 @@ if __name__ == "__main__":
     if not os.path.exists(vm_file):
         raise ValueError("Enter a valid vm file path")
 
-    code_writer = CodeWriter(output_file=output_file)
+    # inlining and pruning look at the whole program, otherwise every file is parsed by
+    # its worker
+    programs = None
+    if args.inline or args.prune:
+        programs = [read_commands(file) for file in files_to_translate]
+
+    if args.inline:
+        programs, inlined_calls = inline_functions(programs, args.inline)
+        print(f"Inlined {inlined_calls} calls")
+
+    if args.prune and len(files_to_translate) > 1:
+        call_graph = build_call_graph(programs)
+        reachable = reachable_functions(call_graph)
+        defined = call_graph.keys() - {ENTRY_FUNCTION}
+        programs = [remove_unreachable(commands, reachable) for commands in programs]
+        print(f"Pruned {len(defined - reachable)} of {len(defined)} functions")
+
+    options = {
+        "optimize": args.optimize,
+        "compact": args.compact,
+        "cache_top": args.cache_top,
+    }
+    translations = translate_files(
+        files_to_translate,
+        programs,
+        args.jobs,
+        cache_dir=args.cache_dir if args.cache else None,
+        cache_size=args.cache_size << 20,
+        **options,
+    )
+
+    code_writer = CodeWriter(output_file=output_file, **options)
     if len(files_to_translate) > 1:
         code_writer.writeBootstrapCode()
 
-    for file in files_to_translate:
-        parser = Parser(input_file=file)
-        path, file_name = os.path.split(file)
-        try:
-            code_writer.setFileName(file_name)
-            while parser.hasMoreCommands():
-                parser.advance()
-                command_type, arg1, arg2 = (
-                    parser.commandType(),
-                    parser.arg1(),
-                    parser.arg2(),
-                )
-
-                if command_type == Command.C_ARITHMETIC:
-                    code_writer.writeArithmetic(arg1)
-                elif command_type == Command.C_POP or command_type == Command.C_PUSH:
-                    code_writer.writePushPop(
-                        command_type, arg1, int(re.sub(r"[\s/]+", "", arg2))
-                    )
-                elif command_type == Command.C_LABEL:
-                    code_writer.writeLabel(arg1)
-                elif command_type == Command.C_GOTO:
-                    code_writer.writeGoto(arg1)
-                elif command_type == Command.C_IF:
-                    code_writer.writeIf(arg1)
-                elif command_type == Command.C_CALL:
-                    code_writer.writeCall(arg1, int(arg2))
-                elif command_type == Command.C_FUNCTION:
-                    code_writer.writeFunction(arg1, int(arg2))
-                elif command_type == Command.C_RETURN:
-                    code_writer.writeReturn()
-        except Exception as e:
-            print(e)
+    written_count, optimized_count = 0, 0
+    for (
+        assembly,
+        shared_routines,
+        file_written_count,
+        file_optimized_count,
+    ), _ in translations:
+        code_writer.writeTranslation(assembly, shared_routines)
+        written_count += file_written_count
+        optimized_count += file_optimized_count
     code_writer.close()
+
+    if args.cache:
+        print(
+            f"Reused {sum(cached for _, cached in translations)} of "
+            f"{len(translations)} cached translations"
+        )
+
+    if args.optimize:
+        written_count += code_writer.instruction_written_count
+        saved = written_count - optimized_count - code_writer.optimized_count
+        print(f"Peephole optimizer removed {saved} of {written_count} instructions")
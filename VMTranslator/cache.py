@@ -0,0 +1,49 @@
+from constants import TRANSLATOR_VERSION
+from filecache import DEFAULT_CACHE_SIZE, FileCache, hash_file
+import hashlib
+import json
+import os
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "VMTranslator")
+
+
+class TranslationCache(FileCache):
+    """Content addressed store of translated vm files."""
+
+    def key(self, vm_file: str, commands: list = None, *options: str) -> str:
+        """Hashes the file name, which static symbols are named after, and the content.
+
+        When commands are supplied they are hashed in place of the content, as whole
+        program passes like inlining make the translation depend on more than the file
+        itself.
+        """
+        _, file_name = os.path.split(vm_file)
+        digest = hashlib.sha256(
+            ":".join([TRANSLATOR_VERSION, file_name, *options]).encode()
+        )
+
+        if commands is not None:
+            digest.update(repr(commands).encode())
+        else:
+            hash_file(vm_file, digest)
+
+        return digest.hexdigest()
+
+    def load(self, key: str):
+        """Returns the cached translation for key, None on a cache miss."""
+        try:
+            with open(self.entry(key)) as file:
+                translation = json.load(file)
+        except FileNotFoundError:
+            return None
+
+        self.touch(key)
+        return tuple(translation)
+
+    def store(self, key: str, translation: tuple):
+        def write_entry(entry):
+            with open(entry, "w") as file:
+                json.dump(translation, file)
+
+        self.write(key, write_entry)
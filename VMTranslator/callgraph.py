@@ -0,0 +1,53 @@
+from command import Command
+
+
+ENTRY_FUNCTION = "Sys.init"
+MAIN_FUNCTION = "Main.main"
+
+
+def build_call_graph(programs: list) -> dict:
+    """Maps every function defined in programs to the set of functions it calls."""
+    graph = {}
+
+    for commands in programs:
+        callees = None
+
+        for command_type, arg1, _ in commands:
+            if command_type == Command.C_FUNCTION:
+                callees = graph.setdefault(arg1, set())
+            elif command_type == Command.C_CALL and callees is not None:
+                callees.add(arg1)
+
+    # without its vm files the OS is provided by the emulator, whose Sys.init runs
+    # Main.main
+    graph.setdefault(ENTRY_FUNCTION, {MAIN_FUNCTION})
+    return graph
+
+
+def reachable_functions(graph: dict, entry: str = ENTRY_FUNCTION) -> set:
+    """Functions reachable through calls from entry, Jack has no function pointers."""
+    reachable = set()
+    pending = [entry]
+
+    while pending:
+        function = pending.pop()
+
+        if function not in reachable:
+            reachable.add(function)
+            pending.extend(graph.get(function, ()))
+
+    return reachable
+
+
+def remove_unreachable(commands: list, reachable: set) -> list:
+    """Drops the functions missing from reachable out of a command list."""
+    kept = []
+    keeping = True
+
+    for command in commands:
+        if command[0] == Command.C_FUNCTION:
+            keeping = command[1] in reachable
+        if keeping:
+            kept.append(command)
+
+    return kept
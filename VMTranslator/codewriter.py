@@ -1,21 +1,117 @@
 from command import Command
+import io
 import os
+import peephole
+
+
+# instructions collected before they are joined and written to the stream in one go
+WRITE_BUFFER_SIZE = 1 << 14
+
+SHARED_EQ = "__VM_EQ"
+SHARED_GT = "__VM_GT"
+SHARED_LT = "__VM_LT"
+SHARED_CALL = "__VM_CALL"
+SHARED_RETURN = "__VM_RETURN"
+
+
+def comparison_routine(label: str, jump: str) -> list:
+    """Replaces the two topmost values with -1 if x - y satisfies jump or 0 otherwise,
+    then returns to the address saved in D."""
+    return [
+        "@R13",
+        "M=D",
+        "@SP",
+        "AM=M-1",
+        "D=M",
+        "A=A-1",
+        "D=M-D",
+        "M=-1",
+        f"@{label}$true",
+        f"D;{jump}",
+        "@SP",
+        "A=M-1",
+        "M=0",
+        f"({label}$true)",
+        "@R13",
+        "A=M",
+        "0;JMP",
+    ]
+
+
+def call_routine() -> list:
+    """Saves the frame of the caller and jumps to the function address in R14, with the
+    argument count in R13 and the return address in D."""
+    instructions = ["@SP", "A=M", "M=D", "@SP", "M=M+1"]
+
+    for segment in ["LCL", "ARG", "THIS", "THAT"]:
+        instructions.extend([f"@{segment}", "D=M", "@SP", "A=M", "M=D", "@SP", "M=M+1"])
+
+    instructions.extend(
+        [
+            "@R13",
+            "D=M",
+            "@5",
+            "D=D+A",
+            "@SP",
+            "D=M-D",
+            "@ARG",
+            "M=D",
+            "@SP",
+            "D=M",
+            "@LCL",
+            "M=D",
+            "@R14",
+            "A=M",
+            "0;JMP",
+        ]
+    )
+    return instructions
 
 
-class CodeWriter:
-    def __init__(self, output_file=None, stream=None):
-        if not (output_file or stream):
-            raise ValueError("Output file or a write stream must be provided.")
+# up to these indexes stepping A up from a segment base is shorter than adding the index
+# to it
+PUSH_CHAIN_LIMIT = 2
+POP_CHAIN_LIMIT = 6
 
-        _, file_name = os.path.split(output_file)
-        self.file_name = file_name
+# stack top cached in D: binary operations pop x from memory and leave x op y in D
+CACHED_BINARY = {"add": "D=D+M", "sub": "D=M-D", "and": "D=D&M", "or": "D=D|M"}
+CACHED_UNARY = {"neg": "D=-D", "not": "D=!D"}
+CACHED_COMPARISONS = {"eq": "JEQ", "gt": "JGT", "lt": "JLT"}
 
-        if output_file:
+SHARED_ROUTINES = {
+    SHARED_EQ: lambda: comparison_routine(SHARED_EQ, "JEQ"),
+    SHARED_GT: lambda: comparison_routine(SHARED_GT, "JGT"),
+    SHARED_LT: lambda: comparison_routine(SHARED_LT, "JLT"),
+    SHARED_CALL: call_routine,
+}
+
+
+class CodeWriter:
+    def __init__(
+        self,
+        output_file=None,
+        stream=None,
+        optimize=False,
+        compact=False,
+        cache_top=False,
+    ):
+        """Without an output_file or a stream the assembly is kept for assembly()."""
+        self.__in_memory = not (output_file or stream)
+
+        if self.__in_memory:
+            self.file_name = None
+            self.stream = io.StringIO()
+        elif output_file:
+            _, self.file_name = os.path.split(output_file)
             self.stream = open(output_file, "w")
         else:
-            if stream.mode != "w":
+            self.file_name = None
+
+            # in-memory streams like io.StringIO are always writable and have no mode
+            if getattr(stream, "mode", "w") != "w":
                 raise ValueError(
-                    f"File opened not opened in 'w' mode instead is open in {stream.mode}"
+                    "File opened not opened in 'w' mode instead is open in "
+                    f"{stream.mode}"
                 )
 
             self.stream = stream
@@ -33,6 +129,31 @@ class CodeWriter:
         }
 
         self.instruction_written_count = 0
+        self.__buffer = []
+
+        # generated labels are numbered per function, or per file outside of functions,
+        # so the assembly of a file only depends on the file itself
+        self.__label_scope = (
+            os.path.splitext(self.file_name)[0] if self.file_name else ""
+        )
+        self.__label_count = 0
+
+        # with optimize set instructions are held back per basic block and peephole
+        # optimized
+        self.optimize = optimize
+        self.optimized_count = 0
+        self.__block = []
+
+        # with compact set comparisons, call and return jump to routines emitted once in
+        # close, trading a few cycles per use for a much smaller ROM
+        self.compact = compact
+        self.__shared_routines = {}
+
+        # with cache_top set the stack top is kept in D, off the stack, between
+        # consecutive commands and only stored when a command needs the stack in memory,
+        # like labels, jumps and calls
+        self.cache_top = cache_top
+        self.__top_in_d = False
 
         self.segment_addresses = {
             "temp": "5",
@@ -48,30 +169,48 @@ class CodeWriter:
         self.writeCall("Sys.init", 0)
 
     def writeArithmetic(self, command: str):
+        if self.cache_top:
+            self.__write_cached_arithmetic(command)
+            return
+
         self.arithmetic_fns[command]()
 
     def writePushPop(self, command: Command, segment: str, index: int):
+        if self.cache_top:
+            self.__write_cached_push_pop(command, segment, index)
+            return
+
         if command == Command.C_PUSH:
             self.__push_cmd(segment, index)
         elif command == Command.C_POP:
             self.__pop_cmd(segment, index)
 
     def writeLabel(self, label: str):
+        self.__spill_top()
         instructions = [f"({label})"]
         self.__write_instructions(instructions)
 
     def writeGoto(self, label: str):
+        self.__spill_top()
         instructions = [f"@{label}", "0;JMP"]
         self.__write_instructions(instructions)
 
     def writeIf(self, label: str):
+        if self.cache_top:
+            self.__write_instructions([*self.__top_to_d(), f"@{label}", "D;JNE"])
+            self.__top_in_d = False
+            return
+
         instructions = ["@SP", "M=M-1", "A=M", "D=M", f"@{label}", "D;JNE"]
         self.__write_instructions(instructions)
 
     def setFileName(self, fileName: str):
         self.file_name = fileName
+        self.__set_label_scope(os.path.splitext(fileName)[0])
 
     def writeFunction(self, functionName: str, nVars: int):
+        self.__spill_top()
+        self.__set_label_scope(functionName)
         instructions = [f"({functionName})"]
 
         for _ in range(nVars):
@@ -88,13 +227,32 @@ class CodeWriter:
         self.__write_instructions(instructions)
 
     def writeCall(self, functionName: str, nArgs: int):
+        self.__spill_top()
+
+        if self.compact:
+            self.__write_shared_call(
+                SHARED_CALL,
+                self.__next_label("ret"),
+                [
+                    f"@{nArgs}",
+                    "D=A",
+                    "@R13",
+                    "M=D",
+                    f"@{functionName}",
+                    "D=A",
+                    "@R14",
+                    "M=D",
+                ],
+            )
+            return
+
         push_instructions = self.__get_push_instructions()
 
         common_instructions = []
         for segment in ["LCL", "ARG", "THIS", "THAT"]:
             common_instructions.extend([f"@{segment}", "D=M", *push_instructions])
 
-        return_label = f"{functionName}$ret.{self.instruction_written_count+1}"
+        return_label = self.__next_label("ret")
         instructions = [
             f"@{return_label}",
             "D=A",
@@ -123,6 +281,28 @@ class CodeWriter:
         self.__write_instructions([f"({return_label})"])
 
     def writeReturn(self):
+        if self.__top_in_d and not self.compact:
+            # the return value is parked in R13 as writing it to *ARG could overwrite
+            # the return address
+            self.__top_in_d = False
+            self.__write_instructions(
+                ["@R13", "M=D", *self.__return_instructions(["@R13", "D=M"])]
+            )
+            return
+
+        self.__spill_top()
+
+        if self.compact:
+            self.__write_instructions([f"@{SHARED_RETURN}", "0;JMP"])
+            self.__add_shared_routine(SHARED_RETURN, self.__return_instructions)
+            return
+
+        self.__write_instructions(self.__return_instructions())
+
+    def __return_instructions(self, load_return_value: list = None) -> list:
+        if load_return_value is None:
+            load_return_value = ["@SP", "M=M-1", "A=M", "D=M"]
+
         instructions = [
             "@LCL",
             "D=M",
@@ -133,10 +313,7 @@ class CodeWriter:
             "D=M",
             "@returnAddr",
             "M=D",
-            "@SP",
-            "M=M-1",
-            "A=M",
-            "D=M",
+            *load_return_value,
             "@ARG",
             "A=M",
             "M=D",
@@ -166,6 +343,135 @@ class CodeWriter:
                 ]
             )
         instructions.extend(["@returnAddr", "A=M", "0;JMP"])
+        return instructions
+
+    def __add_shared_routine(self, label: str, instructions_fn):
+        if label not in self.__shared_routines:
+            self.__shared_routines[label] = instructions_fn()
+
+    def __write_shared_call(
+        self, label: str, return_label: str, setup_instructions: list
+    ):
+        """Jumps to a shared routine with the return address in D."""
+        self.__add_shared_routine(label, SHARED_ROUTINES[label])
+        self.__write_instructions(
+            [
+                *setup_instructions,
+                f"@{return_label}",
+                "D=A",
+                f"@{label}",
+                "0;JMP",
+                f"({return_label})",
+            ]
+        )
+
+    def __write_shared_comparison(self, label: str):
+        self.__write_shared_call(label, self.__next_label("ret"), [])
+
+    def __set_label_scope(self, scope: str):
+        self.__label_scope = scope
+        self.__label_count = 0
+
+    def __next_label(self, kind: str) -> str:
+        self.__label_count += 1
+        return f"{self.__label_scope}${kind}.{self.__label_count}"
+
+    def __spill_top(self):
+        if self.__top_in_d:
+            self.__top_in_d = False
+            self.__write_instructions(self.__get_push_instructions())
+
+    def __top_to_d(self) -> list:
+        """Instructions that pop the stack top into D unless it is already there."""
+        if self.__top_in_d:
+            return []
+
+        self.__top_in_d = True
+        return ["@SP", "AM=M-1", "D=M"]
+
+    def __write_cached_arithmetic(self, command: str):
+        if command in CACHED_BINARY:
+            instructions = [*self.__top_to_d(), "@SP", "AM=M-1", CACHED_BINARY[command]]
+        elif command in CACHED_UNARY:
+            instructions = [*self.__top_to_d(), CACHED_UNARY[command]]
+        elif self.compact:
+            self.__spill_top()
+            self.arithmetic_fns[command]()
+            return
+        else:
+            label = self.__next_label(command)
+            instructions = [
+                *self.__top_to_d(),
+                "@SP",
+                "AM=M-1",
+                "D=M-D",
+                f"@{label}.true",
+                f"D;{CACHED_COMPARISONS[command]}",
+                "D=0",
+                f"@{label}.done",
+                "0;JMP",
+                f"({label}.true)",
+                "D=-1",
+                f"({label}.done)",
+            ]
+        self.__write_instructions(instructions)
+
+    def __write_cached_push_pop(self, command: Command, segment: str, index: int):
+        if segment == "pointer":
+            address = "THIS" if index == 0 else "THAT"
+        elif segment == "temp":
+            address = str(5 + index)
+        elif segment == "static":
+            address = f"{self.file_name.replace('.asm', '')}.{index}"
+        else:
+            address = None
+
+        if command == Command.C_PUSH:
+            self.__spill_top()
+
+            if segment == "constant":
+                instructions = (
+                    [f"D={index}"] if index in (0, 1) else [f"@{index}", "D=A"]
+                )
+            elif address is not None:
+                instructions = [f"@{address}", "D=M"]
+            elif index <= PUSH_CHAIN_LIMIT:
+                instructions = [*self.__segment_chain(segment, index), "D=M"]
+            else:
+                instructions = [
+                    f"@{index}",
+                    "D=A",
+                    f"@{self.segment_addresses[segment]}",
+                    "A=D+M",
+                    "D=M",
+                ]
+            self.__top_in_d = True
+        else:
+            instructions = self.__top_to_d()
+
+            if address is not None:
+                instructions.extend([f"@{address}", "M=D"])
+            elif index <= POP_CHAIN_LIMIT:
+                instructions.extend([*self.__segment_chain(segment, index), "M=D"])
+            else:
+                instructions.extend(
+                    [
+                        "@R13",
+                        "M=D",
+                        f"@{index}",
+                        "D=A",
+                        f"@{self.segment_addresses[segment]}",
+                        "D=D+M",
+                        "@R14",
+                        "M=D",
+                        "@R13",
+                        "D=M",
+                        "@R14",
+                        "A=M",
+                        "M=D",
+                    ]
+                )
+            self.__top_in_d = False
         self.__write_instructions(instructions)
 
     def __push_cmd(self, segment: str, index: int):
@@ -173,20 +479,34 @@ class CodeWriter:
             addr = self.segment_addresses[segment]
 
             if segment == "temp":
-                index = int(addr) + int(index)
-
-            instructions = [
-                f"@{index}",
-                "D=A",
-                f"@{addr}",
-                "A=D+M",
-                "D=M",
-                "@SP",
-                "A=M",
-                "M=D",
-                "@SP",
-                "M=M+1",
-            ]
+                instructions = [
+                    f"@{int(addr) + int(index)}",
+                    "D=M",
+                    "@SP",
+                    "A=M",
+                    "M=D",
+                    "@SP",
+                    "M=M+1",
+                ]
+            elif index <= PUSH_CHAIN_LIMIT:
+                instructions = [
+                    *self.__segment_chain(segment, index),
+                    "D=M",
+                    *self.__get_push_instructions(),
+                ]
+            else:
+                instructions = [
+                    f"@{index}",
+                    "D=A",
+                    f"@{addr}",
+                    "A=D+M",
+                    "D=M",
+                    "@SP",
+                    "A=M",
+                    "M=D",
+                    "@SP",
+                    "M=M+1",
+                ]
         elif segment == "static":
             instructions = [
                 f"@{self.file_name.replace('.asm', '')}.{index}",
@@ -205,32 +525,25 @@ class CodeWriter:
 
             instructions = [f"@{addr}", "D=M", f"@SP", "A=M", "M=D", "@SP", "M=M+1"]
         elif segment == "constant":
-            instructions = [f"@{index}", "D=A", "@SP", "A=M", "M=D", "@SP", "M=M+1"]
+            if index in (0, 1):
+                instructions = ["@SP", "A=M", f"M={index}", "@SP", "M=M+1"]
+            else:
+                instructions = [f"@{index}", "D=A", "@SP", "A=M", "M=D", "@SP", "M=M+1"]
         self.__write_instructions(instructions)
 
     def __pop_cmd(self, segment: str, index: int):
-        if segment in self.segment_addresses:
+        if segment == "temp":
+            instructions = ["@SP", "AM=M-1", "D=M", f"@{5 + index}", "M=D"]
+        elif segment in self.segment_addresses:
             addr = self.segment_addresses[segment]
 
-            if segment == "temp":
+            if index <= POP_CHAIN_LIMIT:
                 instructions = [
-                    "@5",
-                    "D=A",
-                    "@addr",
-                    "M=D",
-                    f"@{index}",
-                    "D=A",
-                    "@addr",
-                    "M=D+M",
                     "@SP",
-                    "M=M-1",
-                    "A=M",
+                    "AM=M-1",
                     "D=M",
-                    "@addr",
-                    "A=M",
+                    *self.__segment_chain(segment, index),
                     "M=D",
-                    "@addr",
-                    "M=0",
                 ]
             else:
                 instructions = [
@@ -254,8 +567,7 @@ class CodeWriter:
         elif segment == "static":
             instructions = [
                 "@SP",
-                "M=M-1",
-                "A=M",
+                "AM=M-1",
                 "D=M",
                 f"@{self.file_name.replace('.asm', '')}.{index}",
                 "M=D",
@@ -268,22 +580,59 @@ class CodeWriter:
 
             instructions = [
                 "@SP",
-                "M=M-1",
-                "A=M",
+                "AM=M-1",
                 "D=M",
                 f"@{addr}",
                 "M=D",
             ]
         self.__write_instructions(instructions)
 
+    def __segment_chain(self, segment: str, index: int) -> list:
+        """Points A at segment[index] by stepping up from the segment base."""
+        if index == 0:
+            return [f"@{self.segment_addresses[segment]}", "A=M"]
+
+        return [
+            f"@{self.segment_addresses[segment]}",
+            "A=M+1",
+            *["A=A+1"] * (index - 1),
+        ]
+
     def __get_push_instructions(self):
         return ["@SP", "A=M", "M=D", "@SP", "M=M+1"]
 
     def __write_instructions(self, instructions):
-        for instruction in instructions:
-            self.stream.write(f"{instruction}\n")
+        if self.optimize:
+            for instruction in instructions:
+                if instruction.startswith("("):
+                    self.__flush_block()
+
+                self.__block.append(instruction)
+
+                if peephole.is_block_boundary(instruction):
+                    self.__flush_block()
+        else:
+            self.__buffer_instructions(instructions)
         self.instruction_written_count += len(instructions)
 
+    def __buffer_instructions(self, instructions):
+        self.__buffer.extend(instructions)
+
+        if len(self.__buffer) >= WRITE_BUFFER_SIZE:
+            self.__flush_buffer()
+
+    def __flush_buffer(self):
+        if self.__buffer:
+            self.stream.write("\n".join(self.__buffer) + "\n")
+            self.__buffer = []
+
+    def __flush_block(self):
+        instructions = peephole.optimize(self.__block)
+        self.__block = []
+
+        self.__buffer_instructions(instructions)
+        self.optimized_count += len(instructions)
+
     def __write_and(self):
         instructions = ["@SP", "M=M-1", "A=M", "D=M", "A=A-1", "M=D&M"]
         self.__write_instructions(instructions)
@@ -297,7 +646,7 @@ class CodeWriter:
         self.__write_instructions(instructions)
 
     def __write_add(self):
-        instructions = ["@SP", "M=M-1", "A=M", "D=M", "A=A-1", "M=M+D"]
+        instructions = ["@SP", "M=M-1", "A=M", "D=M", "A=A-1", "M=D+M"]
         self.__write_instructions(instructions)
 
     def __write_sub(self):
@@ -318,7 +667,11 @@ class CodeWriter:
         self.__write_instructions(instructions)
 
     def __write_eq(self):
-        jump_pos = self.instruction_written_count + 23
+        if self.compact:
+            self.__write_shared_comparison(SHARED_EQ)
+            return
+
+        label = self.__next_label("eq")
         instructions = [
             "@SP",
             "M=M-1",
@@ -326,29 +679,33 @@ class CodeWriter:
             "D=M",
             "A=A-1",
             "D=M-D",
-            f"@EQUAL{jump_pos}",
+            f"@{label}.true",
             "D;JEQ",
-            f"@NOTEQUAL{jump_pos}",
+            f"@{label}.false",
             "0;JMP",
-            f"(EQUAL{jump_pos})",
+            f"({label}.true)",
             " @SP",
             " A=M-1",
             " M=-1",
-            f" @EQEND{jump_pos}",
+            f" @{label}.end",
             " 0;JMP",
-            f"(NOTEQUAL{jump_pos})",
+            f"({label}.false)",
             " @SP",
             " A=M-1",
             " M=0",
-            f" @EQEND{jump_pos}",
+            f" @{label}.end",
             " 0;JMP",
-            f"(EQEND{jump_pos})",
+            f"({label}.end)",
             " 0",
         ]
         self.__write_instructions(instructions)
 
     def __write_gt(self):
-        jump_pos = self.instruction_written_count + 23
+        if self.compact:
+            self.__write_shared_comparison(SHARED_GT)
+            return
+
+        label = self.__next_label("gt")
         instructions = [
             "@SP",
             "M=M-1",
@@ -356,29 +713,33 @@ class CodeWriter:
             "D=M",
             "A=A-1",
             "D=D-M",
-            f"@GREATERTHAN{jump_pos}",
+            f"@{label}.true",
             "D;JLT",
-            f"@NOTGREATERTHAN{jump_pos}",
+            f"@{label}.false",
             "0;JMP",
-            f"(GREATERTHAN{jump_pos})",
+            f"({label}.true)",
             " @SP",
             " A=M-1",
             " M=-1",
-            f" @EQEND{jump_pos}",
+            f" @{label}.end",
             " 0;JMP",
-            f"(NOTGREATERTHAN{jump_pos})",
+            f"({label}.false)",
             " @SP",
             " A=M-1",
             " M=0",
-            f" @EQEND{jump_pos}",
+            f" @{label}.end",
             " 0;JMP",
-            f"(EQEND{jump_pos})",
+            f"({label}.end)",
             " 0",
         ]
         self.__write_instructions(instructions)
 
     def __write_lt(self):
-        jump_pos = self.instruction_written_count + 23
+        if self.compact:
+            self.__write_shared_comparison(SHARED_LT)
+            return
+
+        label = self.__next_label("lt")
         instructions = [
             "@SP",
             "M=M-1",
@@ -386,28 +747,64 @@ class CodeWriter:
             "D=M",
             "A=A-1",
             "D=D-M",
-            f"@LESSTHAN{jump_pos}",
+            f"@{label}.true",
             "D;JGT",
-            f"@NOTLESSTHAN{jump_pos}",
+            f"@{label}.false",
             "0;JMP",
-            f"(LESSTHAN{jump_pos})",
+            f"({label}.true)",
             " @SP",
             " A=M-1",
             " M=-1",
-            f" @LTEND{jump_pos}",
+            f" @{label}.end",
             " 0;JMP",
-            f"(NOTLESSTHAN{jump_pos})",
+            f"({label}.false)",
             " @SP",
             " A=M-1",
             " M=0",
-            f" @LTEND{jump_pos}",
+            f" @{label}.end",
             " 0;JMP",
-            f"(LTEND{jump_pos})",
+            f"({label}.end)",
             "0",
         ]
         self.__write_instructions(instructions)
 
+    @property
+    def shared_routines(self) -> dict:
+        return self.__shared_routines
+
+    def flush(self):
+        """Writes out everything held back, leaving the stack entirely in memory."""
+        self.__spill_top()
+        self.__flush_block()
+        self.__flush_buffer()
+
+    def assembly(self) -> str:
+        """The assembly written so far when no output file or stream was supplied."""
+        if not self.__in_memory:
+            raise ValueError(
+                "Assembly is only kept for writers without an output file or stream"
+            )
+
+        self.__flush_buffer()
+        return self.stream.getvalue()
+
+    def writeTranslation(self, assembly: str, shared_routines: dict):
+        """Appends a separately translated file, its shared routines come in close."""
+        self.flush()
+        self.stream.write(assembly)
+
+        for label, routine in shared_routines.items():
+            self.__shared_routines.setdefault(label, routine)
+
     def close(self):
         instructions = ["@END", "0;JMP", "(END)", " @END", " 0;JMP"]
         self.__write_instructions(instructions)
-        self.stream.close()
+
+        for label, routine in self.__shared_routines.items():
+            self.__write_instructions([f"({label})", *routine])
+        self.__flush_block()
+        self.__flush_buffer()
+
+        # the in-memory buffer stays readable through assembly()
+        if not self.__in_memory:
+            self.stream.close()
@@ -9,3 +9,6 @@ ARITHMETIC_LOGICAL_COMMANDS = {
     "or",
     "not",
 }
+
+# bump whenever a change alters the generated assembly, invalidates cached translations
+TRANSLATOR_VERSION = "1.0"
@@ -0,0 +1,338 @@
+from callgraph import ENTRY_FUNCTION, MAIN_FUNCTION
+from command import Command
+from jackos import JackOS
+from itertools import repeat
+
+
+RAM_SIZE = 32768
+STACK_BASE = 256
+STATIC_BASE = 16
+TEMP_BASE = 5
+SP, LCL, ARG, THIS, THAT = range(5)
+
+HALT_FUNCTION = "Sys.halt"
+
+# opcodes, ordered roughly by how often the Jack compiler emits them as run tests them
+# in this order
+(
+    PUSH_CONSTANT,
+    PUSH_LOCAL,
+    PUSH_ARGUMENT,
+    POP_LOCAL,
+    IF_GOTO,
+    GOTO,
+    ADD,
+    PUSH_THIS,
+    PUSH_THAT,
+    PUSH_RAM,
+    POP_RAM,
+    POP_THIS,
+    POP_THAT,
+    POP_ARGUMENT,
+    SUB,
+    NOT,
+    LT,
+    GT,
+    EQ,
+    NEG,
+    AND,
+    OR,
+    CALL,
+    NATIVE,
+    FUNCTION,
+    RETURN,
+    HALT,
+) = range(27)
+
+ARITHMETIC_OPCODES = {
+    "add": ADD,
+    "sub": SUB,
+    "neg": NEG,
+    "eq": EQ,
+    "gt": GT,
+    "lt": LT,
+    "and": AND,
+    "or": OR,
+    "not": NOT,
+}
+
+# segments addressed relative to a base pointer, temp, static and pointer are resolved
+# to RAM addresses
+PUSH_OPCODES = {
+    "local": PUSH_LOCAL,
+    "argument": PUSH_ARGUMENT,
+    "this": PUSH_THIS,
+    "that": PUSH_THAT,
+}
+POP_OPCODES = {
+    "local": POP_LOCAL,
+    "argument": POP_ARGUMENT,
+    "this": POP_THIS,
+    "that": POP_THAT,
+}
+
+
+def compile_program(
+    programs: list, halt_function: str = HALT_FUNCTION, natives=None
+) -> tuple:
+    """Compiles the command lists of every vm file into one list of (opcode, argument).
+
+    Labels disappear and jumps, calls and static variables are resolved to code indexes
+    and RAM addresses up front, calls to halt_function become a HALT and calls to
+    functions in natives become a NATIVE, whether or not the vm code defines them. The
+    list ends with a HALT the entry function returns to. Returns the code and the code
+    index of every function.
+    """
+    natives = natives or {}
+    functions, labels = {}, {}
+    position = 0
+
+    for commands in programs:
+        function = None
+
+        for command_type, arg1, _ in commands:
+            if command_type == Command.C_LABEL:
+                labels[function, arg1] = position
+                continue
+
+            if command_type == Command.C_FUNCTION:
+                function = arg1
+                functions[function] = position
+            position += 1
+
+    code, statics = [], {}
+
+    for file_index, commands in enumerate(programs):
+        function = None
+
+        for command_type, arg1, arg2 in commands:
+            if command_type == Command.C_ARITHMETIC:
+                code.append((ARITHMETIC_OPCODES[arg1], None))
+            elif command_type == Command.C_PUSH or command_type == Command.C_POP:
+                if arg1 == "constant":
+                    code.append((PUSH_CONSTANT, arg2))
+                    continue
+
+                if arg1 == "temp":
+                    address = TEMP_BASE + arg2
+                elif arg1 == "pointer":
+                    address = THIS + arg2
+                elif arg1 == "static":
+                    address = statics.setdefault(
+                        (file_index, arg2), STATIC_BASE + len(statics)
+                    )
+                else:
+                    opcodes = (
+                        PUSH_OPCODES if command_type == Command.C_PUSH else POP_OPCODES
+                    )
+                    code.append((opcodes[arg1], arg2))
+                    continue
+
+                code.append(
+                    (PUSH_RAM if command_type == Command.C_PUSH else POP_RAM, address)
+                )
+            elif command_type == Command.C_GOTO or command_type == Command.C_IF:
+                if (function, arg1) not in labels:
+                    raise ValueError(f"Label {arg1} is not defined in {function}")
+
+                code.append(
+                    (
+                        GOTO if command_type == Command.C_GOTO else IF_GOTO,
+                        labels[function, arg1],
+                    )
+                )
+            elif command_type == Command.C_CALL:
+                if arg1 == halt_function:
+                    code.append((HALT, None))
+                elif arg1 in natives:
+                    code.append((NATIVE, (natives[arg1], arg2)))
+                elif arg1 in functions:
+                    code.append((CALL, (functions[arg1], arg2)))
+                else:
+                    raise ValueError(f"Function {arg1} is called but not defined")
+            elif command_type == Command.C_FUNCTION:
+                function = arg1
+                code.append((FUNCTION, arg2))
+            elif command_type == Command.C_RETURN:
+                code.append((RETURN, None))
+
+    code.append((HALT, None))
+    return code, functions
+
+
+class VMEmulator:
+    """Executes VM code directly over a Hack RAM, without translating it to assembly.
+
+    The stack, segments and call frames live in RAM exactly as in the translated
+    program, so the OS heap and screen behave the same, while every VM command is a
+    single step. SP, LCL and ARG are held in locals while running and written back to
+    RAM when run returns.
+
+    Functions of the OS classes in native_classes run as Python built-ins from jackos
+    instead of their vm code, each call being a single step, so the step count measures
+    the program rather than the OS. Programs without Sys.init then start at Main.main.
+    """
+
+    def __init__(
+        self,
+        programs: list,
+        ram=None,
+        halt_function: str = HALT_FUNCTION,
+        native_classes=(),
+        input_lines=(),
+    ):
+        self.ram = [0] * RAM_SIZE if ram is None else ram
+
+        if len(self.ram) != RAM_SIZE:
+            raise ValueError(
+                f"RAM must hold {RAM_SIZE} words, supplied RAM holds {len(self.ram)}"
+            )
+
+        self.os = JackOS(self.ram, input_lines) if native_classes else None
+        natives = self.os.functions(native_classes) if self.os else {}
+        self.code, self.functions = compile_program(programs, halt_function, natives)
+        self.reset()
+
+    def reset(self):
+        """Calls Sys.init like the bootstrap code, or starts at the first command."""
+        self.steps = 0
+        self.halted = False
+        self.pc = 0
+
+        entry = ENTRY_FUNCTION
+        if self.os:
+            self.os.init()
+
+            # with a native OS there may be no Sys.init, which would only have
+            # initialized it
+            if entry not in self.functions and MAIN_FUNCTION in self.functions:
+                entry = MAIN_FUNCTION
+
+        if entry in self.functions:
+            ram = self.ram
+            # the frame of the call into the entry function, returning from it ends on
+            # the final HALT
+            for address, value in enumerate(
+                [len(self.code) - 1, 0, 0, 0, 0], start=STACK_BASE
+            ):
+                ram[address] = value
+            ram[SP] = ram[LCL] = STACK_BASE + 5
+            ram[ARG] = STACK_BASE
+            self.pc = self.functions[entry]
+
+    def run(self, steps: int) -> int:
+        """Executes up to steps VM commands, returns the number executed."""
+        code, ram = self.code, self.ram
+        sp, lcl, arg = ram[SP], ram[LCL], ram[ARG]
+        pc = self.pc
+        executed = 0
+
+        for _ in repeat(None, steps):
+            opcode, value = code[pc]
+            pc += 1
+            executed += 1
+
+            if opcode == PUSH_CONSTANT:
+                ram[sp] = value
+                sp += 1
+            elif opcode == PUSH_LOCAL:
+                ram[sp] = ram[lcl + value]
+                sp += 1
+            elif opcode == PUSH_ARGUMENT:
+                ram[sp] = ram[arg + value]
+                sp += 1
+            elif opcode == POP_LOCAL:
+                sp -= 1
+                ram[lcl + value] = ram[sp]
+            elif opcode == IF_GOTO:
+                sp -= 1
+                if ram[sp]:
+                    pc = value
+            elif opcode == GOTO:
+                pc = value
+            elif opcode == ADD:
+                sp -= 1
+                ram[sp - 1] = (ram[sp - 1] + ram[sp] + 32768 & 65535) - 32768
+            elif opcode == PUSH_THIS:
+                ram[sp] = ram[ram[THIS] + value]
+                sp += 1
+            elif opcode == PUSH_THAT:
+                ram[sp] = ram[ram[THAT] + value]
+                sp += 1
+            elif opcode == PUSH_RAM:
+                ram[sp] = ram[value]
+                sp += 1
+            elif opcode == POP_RAM:
+                sp -= 1
+                ram[value] = ram[sp]
+            elif opcode == POP_THIS:
+                sp -= 1
+                ram[ram[THIS] + value] = ram[sp]
+            elif opcode == POP_THAT:
+                sp -= 1
+                ram[ram[THAT] + value] = ram[sp]
+            elif opcode == POP_ARGUMENT:
+                sp -= 1
+                ram[arg + value] = ram[sp]
+            elif opcode == SUB:
+                sp -= 1
+                ram[sp - 1] = (ram[sp - 1] - ram[sp] + 32768 & 65535) - 32768
+            elif opcode == NOT:
+                ram[sp - 1] = ~ram[sp - 1]
+            elif opcode == LT:
+                sp -= 1
+                ram[sp - 1] = -1 if ram[sp - 1] < ram[sp] else 0
+            elif opcode == GT:
+                sp -= 1
+                ram[sp - 1] = -1 if ram[sp - 1] > ram[sp] else 0
+            elif opcode == EQ:
+                sp -= 1
+                ram[sp - 1] = -1 if ram[sp - 1] == ram[sp] else 0
+            elif opcode == NEG:
+                ram[sp - 1] = (32768 - ram[sp - 1] & 65535) - 32768
+            elif opcode == AND:
+                sp -= 1
+                ram[sp - 1] &= ram[sp]
+            elif opcode == OR:
+                sp -= 1
+                ram[sp - 1] |= ram[sp]
+            elif opcode == CALL:
+                target, n_args = value
+                ram[sp] = pc
+                ram[sp + 1] = lcl
+                ram[sp + 2] = arg
+                ram[sp + 3] = ram[THIS]
+                ram[sp + 4] = ram[THAT]
+                arg = sp - n_args
+                sp += 5
+                lcl = sp
+                pc = target
+            elif opcode == NATIVE:
+                function, n_args = value
+                sp -= n_args
+                result = function(*ram[sp : sp + n_args])
+                ram[sp] = 0 if result is None else (result + 32768 & 65535) - 32768
+                sp += 1
+            elif opcode == FUNCTION:
+                for _ in repeat(None, value):
+                    ram[sp] = 0
+                    sp += 1
+            elif opcode == RETURN:
+                frame = lcl
+                pc = ram[frame - 5]
+                ram[arg] = ram[sp - 1]
+                sp = arg + 1
+                ram[THAT] = ram[frame - 1]
+                ram[THIS] = ram[frame - 2]
+                arg = ram[frame - 3]
+                lcl = ram[frame - 4]
+            elif opcode == HALT:
+                self.halted = True
+                pc -= 1
+                executed -= 1
+                break
+
+        ram[SP], ram[LCL], ram[ARG] = sp, lcl, arg
+        self.pc = pc
+        self.steps += executed
+        return executed
@@ -0,0 +1,77 @@
+import hashlib
+import os
+
+
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+
+
+def hash_file(path: str, digest=None):
+    """Feeds the content of path into digest, a new sha256 by default."""
+    digest = digest or hashlib.sha256()
+
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+
+    return digest
+
+
+class FileCache:
+    """Directory of entries named by key, evicting least recently used entries by size.
+
+    Base of the caches of the assembler, the VM translator and the hardware simulator,
+    which only differ in how they derive keys and what an entry holds. Each tool has its
+    own copy of this module so it runs on its own, the copies are kept identical.
+    """
+
+    def __init__(self, cache_dir: str, max_size: int = DEFAULT_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def entry(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def touch(self, key: str) -> bool:
+        """Marks the entry for key as recently used, False when there is none."""
+        try:
+            os.utime(self.entry(key))
+        except FileNotFoundError:
+            return False
+
+        return True
+
+    def write(self, key: str, write_entry):
+        """Stores the entry for key, write_entry writes it to the path it is given."""
+        entry = self.entry(key)
+        temp_entry = f"{entry}.{os.getpid()}.tmp"
+
+        # processes may share the cache, entries only ever appear whole
+        write_entry(temp_entry)
+        os.replace(temp_entry, entry)
+        self.evict()
+
+    def evict(self):
+        entries = []
+
+        for entry in os.scandir(self.cache_dir):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+            total_size -= size
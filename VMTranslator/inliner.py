@@ -0,0 +1,150 @@
+from command import Command
+
+
+DEFAULT_INLINE_THRESHOLD = 16
+
+
+def split_functions(commands: list) -> list:
+    """Splits a command list into lists that each start with their function command."""
+    functions = []
+
+    for command in commands:
+        if command[0] == Command.C_FUNCTION or not functions:
+            functions.append([])
+        functions[-1].append(command)
+
+    return functions
+
+
+def is_inlinable(body: list, threshold: int) -> bool:
+    """Small leaf functions, static is left out as it is bound to the callee's file."""
+    return len(body) <= threshold and all(
+        command_type != Command.C_CALL and arg1 != "static"
+        for command_type, arg1, _ in body
+    )
+
+
+def expand_call(call: tuple, callee: tuple, base: int, suffix: str) -> tuple:
+    """Replaces call with the body of callee.
+
+    The arguments and locals of the callee become caller locals from base on. Returns
+    the commands and the number of caller locals they use. Labels get suffix appended,
+    pointers the callee sets are saved before and restored after the body, as a call
+    would.
+    """
+    _, function_name, n_args = call
+    n_locals, body = callee
+    first_local = base + n_args
+    end_label = f"{function_name}{suffix}"
+
+    saved_pointers = {}
+    for command_type, arg1, arg2 in body:
+        if (
+            command_type == Command.C_POP
+            and arg1 == "pointer"
+            and arg2 not in saved_pointers
+        ):
+            saved_pointers[arg2] = first_local + n_locals + len(saved_pointers)
+
+    # the arguments were pushed in order, so the last one is on top
+    commands = [
+        (Command.C_POP, "local", base + index) for index in reversed(range(n_args))
+    ]
+
+    for index in range(n_locals):
+        commands.extend(
+            [
+                (Command.C_PUSH, "constant", 0),
+                (Command.C_POP, "local", first_local + index),
+            ]
+        )
+
+    for pointer, slot in saved_pointers.items():
+        commands.extend(
+            [(Command.C_PUSH, "pointer", pointer), (Command.C_POP, "local", slot)]
+        )
+
+    needs_end_label = False
+    for position, (command_type, arg1, arg2) in enumerate(body):
+        if command_type == Command.C_RETURN:
+            if position != len(body) - 1:
+                commands.append((Command.C_GOTO, end_label, None))
+                needs_end_label = True
+            continue
+
+        if command_type in (Command.C_PUSH, Command.C_POP):
+            if arg1 == "argument":
+                arg1, arg2 = "local", base + arg2
+            elif arg1 == "local":
+                arg2 = first_local + arg2
+        elif command_type in (Command.C_LABEL, Command.C_GOTO, Command.C_IF):
+            arg1 = f"{arg1}{suffix}"
+
+        commands.append((command_type, arg1, arg2))
+
+    if needs_end_label:
+        commands.append((Command.C_LABEL, end_label, None))
+
+    # the return value stays on top while the saved pointers pass over it
+    for pointer, slot in saved_pointers.items():
+        commands.extend(
+            [(Command.C_PUSH, "local", slot), (Command.C_POP, "pointer", pointer)]
+        )
+
+    return commands, n_args + n_locals + len(saved_pointers)
+
+
+def inline_functions(
+    programs: list, threshold: int = DEFAULT_INLINE_THRESHOLD
+) -> tuple:
+    """Inlines calls to leaf functions of at most threshold commands.
+
+    programs holds the command list of every vm file. Callers grow by the locals needed
+    by their largest inlined call, sites share them as inlined bodies never overlap.
+    Returns the rewritten programs and the number of call sites inlined.
+    """
+    callees = {}
+    for commands in programs:
+        for function in split_functions(commands):
+            header, body = function[0], function[1:]
+
+            if header[0] == Command.C_FUNCTION and is_inlinable(body, threshold):
+                callees[header[1]] = (header[2], body)
+
+    inlined_calls = 0
+    rewritten = []
+
+    for commands in programs:
+        output = []
+
+        for function in split_functions(commands):
+            header, body = function[0], function[1:]
+
+            if header[0] != Command.C_FUNCTION:
+                output.extend(function)
+                continue
+
+            n_locals = header[2]
+            extra_locals = 0
+            inlined_body = []
+
+            for command in body:
+                if command[0] == Command.C_CALL and command[1] in callees:
+                    inlined_calls += 1
+                    expansion, used_locals = expand_call(
+                        command,
+                        callees[command[1]],
+                        n_locals,
+                        f"$inline.{inlined_calls}",
+                    )
+                    inlined_body.extend(expansion)
+                    extra_locals = max(extra_locals, used_locals)
+                else:
+                    inlined_body.append(command)
+
+            output.append((Command.C_FUNCTION, header[1], n_locals + extra_locals))
+            output.extend(inlined_body)
+
+        rewritten.append(output)
+
+    return rewritten, inlined_calls
@@ -0,0 +1,511 @@
+from math import isqrt
+
+
+HEAP_BASE = 2048
+HEAP_END = 16384
+SCREEN = 16384
+KBD = 24576
+SCREEN_WIDTH = 512
+SCREEN_HEIGHT = 256
+ROW_WORDS = SCREEN_WIDTH // 16
+TEXT_ROWS = 23
+TEXT_COLUMNS = 64
+
+NEW_LINE = 128
+BACKSPACE = 129
+DOUBLE_QUOTE = 34
+
+# a native class calls into the classes it depends on directly, so they have to be
+# native as well
+NATIVE_DEPENDENCIES = {
+    "Array": {"Memory"},
+    "String": {"Memory"},
+    "Output": {"String"},
+    "Keyboard": {"String", "Output"},
+}
+NATIVE_CLASSES = [
+    "Math",
+    "Memory",
+    "Array",
+    "String",
+    "Screen",
+    "Output",
+    "Keyboard",
+    "Sys",
+]
+
+
+def to_signed(value: int) -> int:
+    return (value + 32768 & 0xFFFF) - 32768
+
+
+def with_dependencies(classes) -> set:
+    selected = set()
+    pending = list(classes)
+
+    while pending:
+        name = pending.pop()
+
+        if name not in NATIVE_CLASSES:
+            raise ValueError(
+                f"No native implementation of {name}, "
+                f"choose from {', '.join(NATIVE_CLASSES)}"
+            )
+
+        if name not in selected:
+            selected.add(name)
+            pending.extend(NATIVE_DEPENDENCIES.get(name, ()))
+
+    return selected
+
+
+class JackOS:
+    """Python implementations of the Jack OS classes, called with a VM call's arguments.
+
+    They work on the emulator's RAM, so objects are allocated on the same heap and
+    drawing lands in the same screen memory map. The heap has the layout of the book's
+    Memory class, a free list of [length, next] segments and the length of every block
+    in the word before it, so blocks can be handed between native and Jack code. A
+    native String keeps its capacity and length in front of its characters, which is
+    only safe because String is always bound as a whole class. Output is not rendered
+    into screen memory, printed text is kept in a character grid (see text()), and
+    Keyboard reads its lines from input_lines instead of waiting for keys. Reading past
+    the last line raises EOFError rather than making up empty input.
+    """
+
+    def __init__(self, ram, input_lines=()):
+        self.ram = ram
+        self.input_lines = iter(input_lines)
+        self.init()
+
+    def init(self):
+        self.Memory_init()
+        self.color = True
+        self.grid = [[" "] * TEXT_COLUMNS for _ in range(TEXT_ROWS)]
+        self.row = self.column = 0
+
+    def functions(self, classes) -> dict:
+        """Maps the VM name of every function of the given classes to its native."""
+        selected = with_dependencies(classes)
+        natives = {
+            "Math.init": self.Math_init,
+            "Math.abs": self.Math_abs,
+            "Math.multiply": self.Math_multiply,
+            "Math.divide": self.Math_divide,
+            "Math.sqrt": self.Math_sqrt,
+            "Math.max": self.Math_max,
+            "Math.min": self.Math_min,
+            "Memory.init": self.Memory_init,
+            "Memory.peek": self.Memory_peek,
+            "Memory.poke": self.Memory_poke,
+            "Memory.alloc": self.Memory_alloc,
+            "Memory.deAlloc": self.Memory_deAlloc,
+            "Array.new": self.Array_new,
+            "Array.dispose": self.Array_dispose,
+            "String.new": self.String_new,
+            "String.dispose": self.String_dispose,
+            "String.length": self.String_length,
+            "String.charAt": self.String_charAt,
+            "String.setCharAt": self.String_setCharAt,
+            "String.appendChar": self.String_appendChar,
+            "String.eraseLastChar": self.String_eraseLastChar,
+            "String.intValue": self.String_intValue,
+            "String.setInt": self.String_setInt,
+            "String.newLine": self.String_newLine,
+            "String.backSpace": self.String_backSpace,
+            "String.doubleQuote": self.String_doubleQuote,
+            "Screen.init": self.Screen_init,
+            "Screen.clearScreen": self.Screen_clearScreen,
+            "Screen.setColor": self.Screen_setColor,
+            "Screen.drawPixel": self.Screen_drawPixel,
+            "Screen.drawLine": self.Screen_drawLine,
+            "Screen.drawRectangle": self.Screen_drawRectangle,
+            "Screen.drawCircle": self.Screen_drawCircle,
+            "Output.init": self.Output_init,
+            "Output.moveCursor": self.Output_moveCursor,
+            "Output.printChar": self.Output_printChar,
+            "Output.printString": self.Output_printString,
+            "Output.printInt": self.Output_printInt,
+            "Output.println": self.Output_println,
+            "Output.backSpace": self.Output_backSpace,
+            "Keyboard.init": self.Keyboard_init,
+            "Keyboard.keyPressed": self.Keyboard_keyPressed,
+            "Keyboard.readChar": self.Keyboard_readChar,
+            "Keyboard.readLine": self.Keyboard_readLine,
+            "Keyboard.readInt": self.Keyboard_readInt,
+            "Sys.wait": self.Sys_wait,
+            "Sys.error": self.Sys_error,
+        }
+        functions = {
+            name: function
+            for name, function in natives.items()
+            if name.partition(".")[0] in selected
+        }
+        missing = selected - {name.partition(".")[0] for name in functions}
+
+        if missing:
+            raise ValueError(
+                f"No native functions bound for {', '.join(sorted(missing))}"
+            )
+
+        return functions
+
+    def text(self) -> str:
+        return "\n".join("".join(row).rstrip() for row in self.grid).rstrip()
+
+    # Math
+
+    def Math_init(self):
+        pass
+
+    def Math_abs(self, x: int) -> int:
+        return to_signed(abs(x))
+
+    def Math_multiply(self, x: int, y: int) -> int:
+        return to_signed(x * y)
+
+    def Math_divide(self, x: int, y: int) -> int:
+        if y == 0:
+            raise ZeroDivisionError("Math.divide by zero")
+
+        # rounds toward zero like the Jack implementation, which divides the absolute
+        # values
+        quotient = abs(x) // abs(y)
+        return to_signed(quotient if (x < 0) == (y < 0) else -quotient)
+
+    def Math_sqrt(self, x: int) -> int:
+        if x < 0:
+            raise ValueError("Math.sqrt of a negative number")
+
+        return isqrt(x)
+
+    def Math_max(self, a: int, b: int) -> int:
+        return max(a, b)
+
+    def Math_min(self, a: int, b: int) -> int:
+        return min(a, b)
+
+    # Memory
+
+    def Memory_init(self):
+        # the whole heap starts out as one free segment of [length, next segment]
+        self.free_list = HEAP_BASE
+        self.ram[HEAP_BASE] = HEAP_END - HEAP_BASE
+        self.ram[HEAP_BASE + 1] = 0
+
+    def Memory_peek(self, address: int) -> int:
+        return self.ram[address]
+
+    def Memory_poke(self, address: int, value: int):
+        self.ram[address] = value
+
+    def Memory_alloc(self, size: int) -> int:
+        """First fit over the free list, blocks are carved from the end of a segment.
+
+        The word before the returned block holds its length, header included, for
+        deAlloc.
+        """
+        if size <= 0:
+            raise ValueError(f"Memory.alloc of a non positive size: {size}")
+
+        ram = self.ram
+        length = size + 1
+        previous, segment = 0, self.free_list
+
+        while segment:
+            available = ram[segment]
+
+            if available >= length + 2:
+                ram[segment] = available - length
+                block = segment + available - length
+                ram[block] = length
+                return block + 1
+
+            if available >= length:
+                # the rest would not hold a free segment header, hand out the whole
+                # segment
+                self.__link(previous, ram[segment + 1])
+                return segment + 1
+
+            previous, segment = segment, ram[segment + 1]
+
+        raise MemoryError(f"Heap overflow allocating {size} words")
+
+    def Memory_deAlloc(self, address: int):
+        """Puts the block back in the free list, merged with free neighbours."""
+        ram = self.ram
+        segment = address - 1
+        previous, following = 0, self.free_list
+
+        while following and following < segment:
+            previous, following = following, ram[following + 1]
+
+        ram[segment + 1] = following
+        self.__link(previous, segment)
+
+        if following and segment + ram[segment] == following:
+            ram[segment] += ram[following]
+            ram[segment + 1] = ram[following + 1]
+
+        if previous and previous + ram[previous] == segment:
+            ram[previous] += ram[segment]
+            ram[previous + 1] = ram[segment + 1]
+
+    def __link(self, previous: int, segment: int):
+        """Makes segment the free segment after previous, or the free list head."""
+        if previous:
+            self.ram[previous + 1] = segment
+        else:
+            self.free_list = segment
+
+    # Array
+
+    def Array_new(self, size: int) -> int:
+        return self.Memory_alloc(size)
+
+    def Array_dispose(self, this: int):
+        self.Memory_deAlloc(this)
+
+    # String, laid out as capacity, length and then the characters
+
+    def String_new(self, max_length: int) -> int:
+        this = self.Memory_alloc(max_length + 2)
+        self.ram[this] = max_length
+        self.ram[this + 1] = 0
+        return this
+
+    def String_dispose(self, this: int):
+        self.Memory_deAlloc(this)
+
+    def String_length(self, this: int) -> int:
+        return self.ram[this + 1]
+
+    def String_charAt(self, this: int, index: int) -> int:
+        return self.ram[this + 2 + index]
+
+    def String_setCharAt(self, this: int, index: int, char: int):
+        self.ram[this + 2 + index] = char
+
+    def String_appendChar(self, this: int, char: int) -> int:
+        length = self.ram[this + 1]
+
+        if length >= self.ram[this]:
+            raise ValueError("String.appendChar on a full string")
+
+        self.ram[this + 2 + length] = char
+        self.ram[this + 1] = length + 1
+        return this
+
+    def String_eraseLastChar(self, this: int):
+        if self.ram[this + 1] > 0:
+            self.ram[this + 1] -= 1
+
+    def String_intValue(self, this: int) -> int:
+        digits = self.string(this)
+        sign = -1 if digits.startswith("-") else 1
+        digits = digits[1:] if sign < 0 else digits
+        value = 0
+
+        for digit in digits:
+            if not digit.isdigit():
+                break
+            value = value * 10 + int(digit)
+
+        return to_signed(sign * value)
+
+    def String_setInt(self, this: int, value: int):
+        digits = str(value)
+
+        if len(digits) > self.ram[this]:
+            raise ValueError("String.setInt on a string too short for the number")
+
+        for index, char in enumerate(digits):
+            self.ram[this + 2 + index] = ord(char)
+        self.ram[this + 1] = len(digits)
+
+    def String_newLine(self) -> int:
+        return NEW_LINE
+
+    def String_backSpace(self) -> int:
+        return BACKSPACE
+
+    def String_doubleQuote(self) -> int:
+        return DOUBLE_QUOTE
+
+    def string(self, this: int) -> str:
+        length = self.ram[this + 1]
+        return "".join(
+            chr(self.ram[address]) for address in range(this + 2, this + 2 + length)
+        )
+
+    def new_string(self, text: str) -> int:
+        this = self.String_new(len(text))
+
+        for char in text:
+            self.String_appendChar(this, ord(char))
+        return this
+
+    # Screen
+
+    def Screen_init(self):
+        self.color = True
+
+    def Screen_clearScreen(self):
+        for address in range(SCREEN, KBD):
+            self.ram[address] = 0
+
+    def Screen_setColor(self, color: int):
+        self.color = color != 0
+
+    def Screen_drawPixel(self, x: int, y: int):
+        self.__check_point(x, y)
+        self.__draw_span(x, x, y)
+
+    def Screen_drawLine(self, x1: int, y1: int, x2: int, y2: int):
+        self.__check_point(x1, y1)
+        self.__check_point(x2, y2)
+
+        if y1 == y2:
+            self.__draw_span(min(x1, x2), max(x1, x2), y1)
+            return
+
+        # Bresenham, stepping along the longer axis
+        dx, dy = abs(x2 - x1), -abs(y2 - y1)
+        step_x, step_y = (1 if x1 < x2 else -1), (1 if y1 < y2 else -1)
+        error = dx + dy
+
+        while True:
+            self.__draw_span(x1, x1, y1)
+
+            if x1 == x2 and y1 == y2:
+                break
+
+            if 2 * error >= dy:
+                error += dy
+                x1 += step_x
+            if 2 * error <= dx:
+                error += dx
+                y1 += step_y
+
+    def Screen_drawRectangle(self, x1: int, y1: int, x2: int, y2: int):
+        self.__check_point(x1, y1)
+        self.__check_point(x2, y2)
+
+        for y in range(y1, y2 + 1):
+            self.__draw_span(x1, x2, y)
+
+    def Screen_drawCircle(self, x: int, y: int, r: int):
+        self.__check_point(x, y)
+
+        if r < 0 or r > 181:
+            raise ValueError(f"Screen.drawCircle with an illegal radius: {r}")
+
+        for dy in range(-r, r + 1):
+            dx = isqrt(r * r - dy * dy)
+            row = y + dy
+
+            if 0 <= row < SCREEN_HEIGHT:
+                self.__draw_span(max(x - dx, 0), min(x + dx, SCREEN_WIDTH - 1), row)
+
+    def __check_point(self, x: int, y: int):
+        if not (0 <= x < SCREEN_WIDTH and 0 <= y < SCREEN_HEIGHT):
+            raise ValueError(f"Screen coordinates out of range: ({x}, {y})")
+
+    def __draw_span(self, x1: int, x2: int, y: int):
+        """Sets pixels x1..x2 of row y to the current color, by whole words."""
+        ram, row = self.ram, SCREEN + y * ROW_WORDS
+
+        for word in range(x1 // 16, x2 // 16 + 1):
+            low = max(x1 - word * 16, 0)
+            high = min(x2 - word * 16, 15)
+            mask = (0xFFFF >> (15 - high + low)) << low
+            value = ram[row + word] & 0xFFFF
+            ram[row + word] = to_signed(value | mask if self.color else value & ~mask)
+
+    # Output
+
+    def Output_init(self):
+        self.grid = [[" "] * TEXT_COLUMNS for _ in range(TEXT_ROWS)]
+        self.row = self.column = 0
+
+    def Output_moveCursor(self, row: int, column: int):
+        if not (0 <= row < TEXT_ROWS and 0 <= column < TEXT_COLUMNS):
+            raise ValueError(f"Output.moveCursor out of range: ({row}, {column})")
+
+        self.row, self.column = row, column
+
+    def Output_printChar(self, char: int):
+        if char == NEW_LINE:
+            self.Output_println()
+        elif char == BACKSPACE:
+            self.Output_backSpace()
+        else:
+            self.grid[self.row][self.column] = chr(char)
+            self.column += 1
+
+            if self.column == TEXT_COLUMNS:
+                self.Output_println()
+
+    def Output_printString(self, this: int):
+        for char in self.string(this):
+            self.Output_printChar(ord(char))
+
+    def Output_printInt(self, value: int):
+        for char in str(value):
+            self.Output_printChar(ord(char))
+
+    def Output_println(self):
+        self.row = (self.row + 1) % TEXT_ROWS
+        self.column = 0
+
+    def Output_backSpace(self):
+        if self.column > 0:
+            self.column -= 1
+        elif self.row > 0:
+            self.row, self.column = self.row - 1, TEXT_COLUMNS - 1
+
+        self.grid[self.row][self.column] = " "
+
+    # Keyboard
+
+    def Keyboard_init(self):
+        pass
+
+    def Keyboard_keyPressed(self) -> int:
+        return self.ram[KBD]
+
+    def __read_input(self) -> str:
+        line = next(self.input_lines, None)
+
+        if line is None:
+            raise EOFError("Keyboard input exhausted, supply more lines with --input")
+        return line
+
+    def Keyboard_readChar(self) -> int:
+        line = self.__read_input()
+        char = ord(line[0]) if line else NEW_LINE
+        self.Output_printChar(char)
+        return char
+
+    def Keyboard_readLine(self, message: int) -> int:
+        self.Output_printString(message)
+        line = self.__read_input()
+
+        for char in line:
+            self.Output_printChar(ord(char))
+        self.Output_println()
+        return self.new_string(line)
+
+    def Keyboard_readInt(self, message: int) -> int:
+        line = self.Keyboard_readLine(message)
+        value = self.String_intValue(line)
+        self.String_dispose(line)
+        return value
+
+    # Sys, halt is bound by the emulator itself
+
+    def Sys_wait(self, duration: int):
+        pass
+
+    def Sys_error(self, error_code: int):
+        raise ValueError(f"Sys.error called with error code {to_signed(error_code)}")
@@ -0,0 +1,66 @@
+SCRATCH_ADDRESS = "@addr"
+
+# (pattern, replacement) pairs matched against the tail of the optimized instructions
+REWRITE_RULES = [
+    # SP incremented and decremented straight after, a push followed by a pop
+    (["@SP", "M=M+1", "@SP", "M=M-1"], ["@SP"]),
+    (["@SP", "M=M+1", "@SP", "AM=M-1"], ["@SP", "A=M"]),
+    # the value stored on top of the stack is reloaded into D where it already is
+    (["@SP", "A=M", "M=D", "@SP", "A=M", "D=M"], ["@SP", "A=M"]),
+    # the scratch address of a pop is always written before it is read
+    ([SCRATCH_ADDRESS, "M=0"], [SCRATCH_ADDRESS]),
+    (["A=M", "A=A-1"], ["A=M-1"]),
+    (["A=M", "A=A+1"], ["A=M+1"]),
+]
+
+
+def is_block_boundary(instruction: str) -> bool:
+    """Labels start and jumps end a basic block, rewrites never cross either."""
+    return instruction.startswith("(") or ";" in instruction
+
+
+def _only_sets_a(instruction: str) -> bool:
+    return instruction.startswith("@") or (
+        instruction.startswith("A=") and ";" not in instruction
+    )
+
+
+def _rewrite_tail(instructions: list) -> bool:
+    for pattern, replacement in REWRITE_RULES:
+        if instructions[-len(pattern) :] == pattern:
+            instructions[-len(pattern) :] = replacement
+            return True
+
+    # a computation without destination or jump, like the 0 after the comparison labels
+    if (
+        instructions
+        and not instructions[-1].startswith(("@", "("))
+        and "=" not in instructions[-1]
+        and ";" not in instructions[-1]
+    ):
+        del instructions[-1]
+        return True
+
+    # an A value that is overwritten by the next A-instruction is dead
+    if (
+        len(instructions) >= 2
+        and instructions[-1].startswith("@")
+        and _only_sets_a(instructions[-2])
+    ):
+        del instructions[-2]
+        return True
+
+    return False
+
+
+def optimize(instructions: list) -> list:
+    """Peephole optimizes the instructions of a single basic block."""
+    optimized = []
+
+    for instruction in instructions:
+        optimized.append(instruction.strip())
+
+        while _rewrite_tail(optimized):
+            pass
+
+    return optimized
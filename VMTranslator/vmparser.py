@@ -1,5 +1,102 @@
 from command import Command
 from constants import ARITHMETIC_LOGICAL_COMMANDS
+from array import array
+import sys
+
+
+COMMAND_TYPES = list(Command)
+COMMAND_CODES = {command: code for code, command in enumerate(COMMAND_TYPES)}
+KEYWORD_COMMANDS = {
+    "push": Command.C_PUSH,
+    "pop": Command.C_POP,
+    "label": Command.C_LABEL,
+    "goto": Command.C_GOTO,
+    "if-goto": Command.C_IF,
+    "function": Command.C_FUNCTION,
+    "call": Command.C_CALL,
+    "return": Command.C_RETURN,
+    **{command: Command.C_ARITHMETIC for command in ARITHMETIC_LOGICAL_COMMANDS},
+}
+
+# arg2 is a non negative index or count whenever a command has one
+NO_ARGUMENT = -1
+
+
+class CommandList:
+    """Tokenized commands of a vm file, as parallel arrays of command, name id and arg2.
+
+    Names (segments, labels, functions and arithmetic commands) are interned once into
+    names and referenced by id. Iterating yields (command type, arg1, arg2) tuples with
+    arg2 as an int or None, so translation, emulation and analysis passes can all share
+    one parse.
+    """
+
+    __slots__ = ("codes", "arg1_ids", "arg2s", "names")
+
+    def __init__(self, codes=(), arg1_ids=(), arg2s=(), names=None):
+        self.codes = array("B", codes)
+        self.arg1_ids = array("H", arg1_ids)
+        self.arg2s = array("i", arg2s)
+        self.names = names or []
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index: int) -> tuple:
+        arg2 = self.arg2s[index]
+        return (
+            COMMAND_TYPES[self.codes[index]],
+            self.names[self.arg1_ids[index]],
+            None if arg2 == NO_ARGUMENT else arg2,
+        )
+
+    def __iter__(self):
+        names = self.names
+
+        for code, name_id, arg2 in zip(self.codes, self.arg1_ids, self.arg2s):
+            yield COMMAND_TYPES[code], names[
+                name_id
+            ], None if arg2 == NO_ARGUMENT else arg2
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+def parse_commands(source: str) -> CommandList:
+    """Tokenizes vm source in a single pass, lines that are not commands are skipped."""
+    codes, arg1_ids, arg2s = [], [], []
+    name_ids = {None: 0}
+
+    for line in source.splitlines():
+        tokens = line.partition("//")[0].split()
+
+        if not tokens or tokens[0] not in KEYWORD_COMMANDS:
+            continue
+
+        command_type = KEYWORD_COMMANDS[tokens[0]]
+
+        if command_type == Command.C_ARITHMETIC:
+            arg1, arg2 = tokens[0], NO_ARGUMENT
+        elif command_type == Command.C_RETURN:
+            arg1, arg2 = None, NO_ARGUMENT
+        else:
+            arg1, arg2 = tokens[1], int(tokens[2]) if len(tokens) >= 3 else NO_ARGUMENT
+
+        name_id = name_ids.get(arg1)
+        if name_id is None:
+            name_id = name_ids[arg1] = len(name_ids)
+
+        codes.append(COMMAND_CODES[command_type])
+        arg1_ids.append(name_id)
+        arg2s.append(arg2)
+
+    names = [sys.intern(name) if name is not None else None for name in name_ids]
+    return CommandList(codes, arg1_ids, arg2s, names)
+
+
+def read_commands(input_file: str) -> CommandList:
+    with open(input_file) as file:
+        return parse_commands(file.read())
 
 
 class Parser:
@@ -17,64 +114,23 @@ class Parser:
                 f"Input file stream expected to be in 'r' mode but was in {stream.mode}"
             )
 
-        self.lines = file_content.readlines()
-        self.line_count = len(self.lines)
-        self.current_line = 0
+        self.commands = parse_commands(file_content.read())
+        self.command_count = len(self.commands)
+        self.current_command = 0
 
         file_content.close()
 
     def hasMoreCommands(self) -> bool:
-        return self.current_line != self.line_count
+        return self.current_command != self.command_count
 
     def advance(self):
         if not self.hasMoreCommands():
             return
 
-        self.command = None
-        self.argument_1 = None
-        self.argument_2 = None
-
-        line = self.lines[self.current_line].strip()
-        tokens = line.split(" ")
-
-        if len(tokens) > 0:
-            command = tokens[0]
-            if command == "push":
-                self.__create_command(Command.C_PUSH, tokens)
-            elif command == "pop":
-                self.__create_command(Command.C_POP, tokens)
-            elif command in ARITHMETIC_LOGICAL_COMMANDS:
-                self.command = Command.C_ARITHMETIC
-                self.argument_1 = command
-            elif command == "label":
-                self.command = Command.C_LABEL
-                self.__create_command(Command.C_LABEL, tokens)
-            elif command == "goto":
-                self.command = Command.C_GOTO
-                self.__create_command(Command.C_GOTO, tokens)
-            elif command == "if-goto":
-                self.command = Command.C_IF
-                self.__create_command(Command.C_IF, tokens)
-            elif command == "call":
-                self.command = Command.C_CALL
-                self.__create_command(Command.C_CALL, tokens)
-            elif command == "function":
-                self.command = Command.C_FUNCTION
-                self.__create_command(Command.C_FUNCTION, tokens)
-            elif command == "return":
-                self.command = Command.C_RETURN
-            else:
-                self.current_line += 1
-                return self.advance()
-
-        self.current_line += 1
-
-    def __create_command(self, command: Command, tokens: list):
-        self.command = command
-        self.argument_1 = tokens[1]
-
-        if len(tokens) >= 3:
-            self.argument_2 = tokens[2]
+        self.command, self.argument_1, self.argument_2 = self.commands[
+            self.current_command
+        ]
+        self.current_command += 1
 
     def commandType(self) -> Command:
         return self.command